@@ -0,0 +1,59 @@
+import sys
+import os
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'revealpack'))
+
+from _utils.html_operations import beautify_html, HTML_FORMATTERS
+
+def generate_deck(slides=200, svg_paths=500, code_lines=80):
+    """Generate a large synthetic deck with embedded SVGs and code listings."""
+    sections = []
+    for i in range(slides):
+        paths = ''.join(
+            f'<path d="M{j} {j} L{j + 10} {j + 20} Z" fill="#{j % 4096:03x}"/>'
+            for j in range(svg_paths)
+        )
+        code = '\n'.join(f'    if (x &lt; {j}) {{ y += &quot;{j}&quot;; }}' for j in range(code_lines))
+        sections.append(
+            f'<section data-background-color="#fff"><h2>Slide {i}</h2>'
+            f'<svg viewBox="0 0 600 600">{paths}</svg>'
+            f'<pre><code class="language-js">{code}</code></pre>'
+            f'<p>Text with <b>inline</b> markup &amp; entities.</p></section>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>Benchmark</title></head><body>'
+        f'<div class="reveal"><div class="slides">{"".join(sections)}</div></div>'
+        '</body></html>'
+    )
+
+def benchmark(html_str, formatter, repeat=3, indent_size=2):
+    """Return the best wall time in seconds over repeated runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        beautify_html(html_str, indent_size, formatter=formatter)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the HTML formatters used by revealpack build.")
+    parser.add_argument('files', nargs='*', help="Rendered deck HTML files to format (default: a generated deck)")
+    parser.add_argument('--slides', type=int, default=200, help="Slides in the generated deck")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per formatter, the best is reported")
+    args = parser.parse_args()
+
+    if args.files:
+        inputs = []
+        for file in args.files:
+            with open(file, 'r', encoding='utf-8') as f:
+                inputs.append((file, f.read()))
+    else:
+        inputs = [(f"generated deck ({args.slides} slides)", generate_deck(args.slides))]
+
+    for name, html_str in inputs:
+        print(f"{name}: {len(html_str) / 1e6:.1f} MB")
+        results = {formatter: benchmark(html_str, formatter, args.repeat) for formatter in HTML_FORMATTERS}
+        for formatter, seconds in results.items():
+            print(f"  {formatter:>5}: {seconds:.3f} s ({results['bs4'] / seconds:.1f}x)")
@@ -5,10 +5,242 @@ import logging
 import fnmatch
 import csv
 import re
+import json
+import time
+import errno
+import platform
 from pathlib import Path
 
+from .manifest_operations import hash_file
+from .profile_operations import count, get_profiler
+
 ignore = ["*.DS_Store", "*.ffs_db", "__pycache__"]
 
+COPY_STATE_VERSION = 1
+# Files modified this recently may change again within the same timestamp,
+# so their stat data is not trusted on the next build.
+RACY_WINDOW_NS = 2_000_000_000
+
+_copy_state = None
+
+COPY_MODES = ("copy", "hardlink", "reflink", "auto")
+# Linux FICLONE ioctl request number
+FICLONE = 0x40049409
+
+_copy_mode = "copy"
+# (source device, destination device) pairs on which a copy method failed
+_unsupported = {"hardlink": set(), "reflink": set(), "copy_file_range": set()}
+
+
+def _stat_key(stat_result):
+    return [stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino]
+
+
+class CopyState:
+    """
+    Persisted record of the files copied by previous builds.
+
+    Each destination maps to its source path, the (size, mtime_ns, inode) of
+    both files when they were last known to be identical and, when it was
+    computed, their content hash. This lets unchanged files be skipped from
+    their metadata alone, falling back to hashing only when stat data is
+    ambiguous.
+    """
+
+    def __init__(self, path=None):
+        self.path = str(path) if path else None
+        self.entries = {}
+        self.seen = set()
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """Load the copy state from disk, discarding it if unreadable or outdated."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable copy state {self.path}: {e}")
+            return
+        if data.get("version") == COPY_STATE_VERSION:
+            self.entries = data.get("files", {})
+
+    def is_identical(self, src, dest, src_stat, dest_stat):
+        """Return True if dest holds the same content as src."""
+        if src_stat.st_size != dest_stat.st_size:
+            return False
+        entry = self.entries.get(dest)
+        dest_matches = entry is not None and entry["dest_stat"] == _stat_key(dest_stat)
+        if dest_matches and entry["src"] == src and entry["src_stat"] == _stat_key(src_stat):
+            return True
+        # Stat data is ambiguous, compare content hashes
+        src_hash = hash_file(src)
+        dest_hash = entry["hash"] if dest_matches and entry["hash"] else hash_file(dest)
+        if src_hash != dest_hash:
+            return False
+        self.record(src, dest, src_stat, dest_stat, src_hash)
+        return True
+
+    def record(self, src, dest, src_stat=None, dest_stat=None, digest=None):
+        """Record that dest now holds the same content as src."""
+        src_stat = src_stat or os.stat(src)
+        dest_stat = dest_stat or os.stat(dest)
+        racy = time.time_ns() - src_stat.st_mtime_ns < RACY_WINDOW_NS
+        self.entries[dest] = {
+            "src": src,
+            "src_stat": None if racy else _stat_key(src_stat),
+            "dest_stat": _stat_key(dest_stat),
+            "hash": digest,
+        }
+        self.seen.add(dest)
+        self.dirty = True
+
+    def touch(self, dest):
+        self.seen.add(dest)
+
+    def save(self, prune=True):
+        """
+        Write the copy state to disk, dropping entries not seen in this build
+        unless ``prune`` is False, as for builds that only ran some stages.
+        """
+        for dest in list(self.entries) if prune else ():
+            if dest not in self.seen:
+                del self.entries[dest]
+                self.dirty = True
+        # Start over for the next build of a long-running process
+        self.seen = set()
+        if not self.path or not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": COPY_STATE_VERSION, "files": self.entries}, f)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+        logging.debug(f"Saved copy state to {self.path}")
+
+
+def set_copy_mode(mode):
+    """Set the copy mode used by copy_file: one of COPY_MODES."""
+    global _copy_mode
+    if mode not in COPY_MODES:
+        raise ValueError(f"Unknown copy mode '{mode}', expected one of: {', '.join(COPY_MODES)}")
+    _copy_mode = mode
+
+
+def _reflink(src, dest):
+    """Clone src to the new file dest, sharing its data blocks. Returns False if unsupported."""
+    if platform.system() == "Darwin":
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "clonefile"):
+            return False
+        return libc.clonefile(os.fsencode(src), os.fsencode(dest), 0) == 0
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        try:
+            fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+            return True
+        except OSError:
+            pass
+    os.remove(dest)
+    return False
+
+
+def _copy_file_range(src, dest):
+    """Copy src to the new file dest in the kernel. Returns False if unsupported."""
+    if not hasattr(os, "copy_file_range"):
+        return False
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdest.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+            if remaining <= 0:
+                return True
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM):
+                raise
+    os.remove(dest)
+    return False
+
+
+def _copy_to_new_file(src, dest, mode):
+    """Create dest as a copy of src using mode, falling back to a regular copy."""
+    devices = (os.stat(src).st_dev, os.stat(os.path.dirname(dest) or ".").st_dev)
+    if mode == "hardlink" and devices not in _unsupported["hardlink"]:
+        try:
+            os.link(src, dest)
+            return "hardlink"
+        except OSError as e:
+            logging.warning(f"Hard links are not supported from {src} to {os.path.dirname(dest)} ({e}), copying instead.")
+            _unsupported["hardlink"].add(devices)
+    if mode in ("reflink", "auto") and devices not in _unsupported["reflink"]:
+        if _reflink(src, dest):
+            shutil.copystat(src, dest)
+            return "reflink"
+        if mode == "reflink":
+            logging.warning(f"Reflinks are not supported from {src} to {os.path.dirname(dest)}, copying instead.")
+        _unsupported["reflink"].add(devices)
+    if mode == "auto" and devices not in _unsupported["copy_file_range"]:
+        if _copy_file_range(src, dest):
+            shutil.copystat(src, dest)
+            return "copy_file_range"
+        _unsupported["copy_file_range"].add(devices)
+    shutil.copy2(src, dest)
+    return "copy"
+
+
+def copy_file(src, dest, mode=None):
+    """
+    Copy src to dest using the given or configured copy mode.
+
+    The copy is created next to dest and moved over it, so an existing dest
+    that is a hard link of another file is replaced rather than overwritten.
+
+    Returns:
+    str: dest, like shutil.copy2, so it can be used as a copytree copy_function.
+    """
+    mode = mode or _copy_mode
+    temp_path = os.path.join(os.path.dirname(dest) or ".", f".{os.path.basename(dest)}.{os.getpid()}.tmp")
+    try:
+        method = _copy_to_new_file(src, temp_path, mode)
+        os.replace(temp_path, dest)
+    except BaseException:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        raise
+    logging.debug(f"Copied {src} to {dest} ({method})")
+    if get_profiler() is not None:
+        count("files_copied")
+        if method != "hardlink":
+            count("bytes_copied", os.stat(dest).st_size)
+    return dest
+
+
+def unshare_file(path):
+    """Remove path if it is hard linked elsewhere, so writing it cannot change the other links."""
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def set_copy_state(state):
+    """Use state to detect unchanged files in copy_file_if_different, or None to compare contents."""
+    global _copy_state
+    _copy_state = state
+
 
 def copy_and_overwrite(src, dest, copied_files=None):
     """Copy directory from src to dest, overwrite if different. Optionally return a list of copied file paths."""
@@ -19,11 +251,15 @@ def copy_and_overwrite(src, dest, copied_files=None):
     src = src.replace('\\', '/')
     
     if not os.path.exists(dest):
-        shutil.copytree(src, dest)
+        shutil.copytree(src, dest, copy_function=copy_file)
         logging.info(f"Copying directory {dest}.")
         for root, _, files in os.walk(dest):
             for file in files:
-                copied_files.append(os.path.join(root, file))
+                dest_file = os.path.join(root, file)
+                copied_files.append(dest_file)
+                if _copy_state is not None:
+                    src_file = os.path.join(src, os.path.relpath(dest_file, dest))
+                    _copy_state.record(os.path.abspath(src_file), os.path.abspath(dest_file))
         return copied_files
 
     for item in os.listdir(src):
@@ -56,19 +292,162 @@ def copy_file_if_different(src, dest, copied_files=[]):
     src_file_name = os.path.basename(src)
     if any(fnmatch.fnmatch(src_file_name, pattern) for pattern in ignore):
         logging.info(f"Skipping file {src} as it matches ignore pattern.")
+        count("files_skipped")
         return
 
-    if os.path.exists(dest):
+    if _copy_state is not None:
+        _copy_with_state(_copy_state, src, dest)
+    elif os.path.exists(dest):
         if not filecmp.cmp(src, dest, shallow=False):
-            shutil.copy2(src, dest)
+            copy_file(src, dest)
             logging.info(f"Overwriting file {dest} because it's different.")
-        # else:
-        # logging.info(f"File {dest} is identical, skipping copy.")
+        else:
+            # logging.info(f"File {dest} is identical, skipping copy.")
+            count("files_skipped")
     else:
-        shutil.copy2(src, dest)
+        copy_file(src, dest)
         logging.info(f"Copying file {dest}.")
     copied_files.append(dest)
 
+def _copy_with_state(state, src, dest):
+    """
+    Copy src to dest unless the copy state shows they are already identical.
+
+    Returns:
+    bool: True if dest was written.
+    """
+    src = os.path.abspath(src)
+    dest = os.path.abspath(dest)
+    src_stat = os.stat(src)
+    try:
+        dest_stat = os.stat(dest)
+    except FileNotFoundError:
+        dest_stat = None
+
+    if dest_stat is not None:
+        if state.is_identical(src, dest, src_stat, dest_stat):
+            state.touch(dest)
+            count("files_skipped")
+            return False
+        copy_file(src, dest)
+        logging.info(f"Overwriting file {dest} because it's different.")
+    else:
+        copy_file(src, dest)
+        logging.info(f"Copying file {dest}.")
+    state.record(src, dest, src_stat)
+    return True
+
+
+def sync_tree(src, dest, state=None):
+    """
+    Make the directory dest a copy of src, like ``rsync --delete``.
+
+    Files and directories in dest that are not in src are removed, and only
+    new or changed files are copied. With a persisted ``CopyState``, files
+    are compared by their recorded stat data, so an unchanged tree is synced
+    without reading any file; without one, same-sized files are hashed.
+
+    Returns:
+    tuple: The number of files copied, removed and left unchanged.
+    """
+    state = state if state is not None else CopyState()
+    src = os.path.abspath(src)
+    dest = os.path.abspath(dest)
+    src_files = set()
+    src_dirs = set()
+    for _, relative_path, is_dir in scan_tree(src):
+        (src_dirs if is_dir else src_files).add(relative_path)
+
+    # Remove what is no longer in src first, which also clears files and
+    # directories that changed into one another
+    removed = 0
+    for root, dirnames, filenames in os.walk(dest):
+        relative_root = os.path.relpath(root, dest)
+        for name in list(dirnames):
+            relative_path = os.path.normpath(os.path.join(relative_root, name))
+            if relative_path not in src_dirs:
+                shutil.rmtree(os.path.join(root, name))
+                dirnames.remove(name)
+                removed += 1
+                logging.debug(f"Removed directory {os.path.join(root, name)}")
+        for name in filenames:
+            relative_path = os.path.normpath(os.path.join(relative_root, name))
+            if relative_path not in src_files:
+                os.remove(os.path.join(root, name))
+                removed += 1
+                logging.debug(f"Removed file {os.path.join(root, name)}")
+
+    os.makedirs(dest, exist_ok=True)
+    for relative_path in sorted(src_dirs):
+        os.makedirs(os.path.join(dest, relative_path), exist_ok=True)
+    copied = 0
+    for relative_path in sorted(src_files):
+        if _copy_with_state(state, os.path.join(src, relative_path), os.path.join(dest, relative_path)):
+            copied += 1
+    return copied, removed, len(src_files) - copied
+
+def _compile_alternatives(patterns):
+    """Compile patterns into one combined regex, or one regex each if they cannot be combined."""
+    if not patterns:
+        return []
+    # Backreferences and named groups change meaning once patterns are combined
+    if any(re.search(r'\\\d|\(\?P[<=]', pattern) for pattern in patterns):
+        return [re.compile(pattern) for pattern in patterns]
+    try:
+        return [re.compile("|".join(f"(?:{pattern})" for pattern in patterns))]
+    except re.error:
+        return [re.compile(pattern) for pattern in patterns]
+
+
+class ExclusionMatcher:
+    """
+    Compiled exclusion patterns.
+
+    Patterns ending in ``$`` are searched in the full path and all others in
+    the file or directory name only. Each group is combined into a single
+    regular expression where possible.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.name_matchers = _compile_alternatives([p for p in self.patterns if not p.endswith('$')])
+        self.path_matchers = _compile_alternatives([p for p in self.patterns if p.endswith('$')])
+
+    def matches(self, name, path):
+        return (
+            any(matcher.search(name) for matcher in self.name_matchers)
+            or any(matcher.search(path) for matcher in self.path_matchers)
+        )
+
+
+def scan_tree(root, matcher=None):
+    """
+    Walk a directory tree with os.scandir, skipping excluded entries.
+
+    Excluded directories are not descended into.
+
+    Yields:
+    tuple: (path, relative_path, is_dir) for each included file and directory.
+    """
+    stack = [(str(root), "")]
+    while stack:
+        directory, relative_dir = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if matcher is not None and matcher.matches(entry.name, entry.path):
+                        logging.debug(f"Excluding {entry.path}")
+                        continue
+                    relative_path = os.path.join(relative_dir, entry.name) if relative_dir else entry.name
+                    if entry.is_dir():
+                        yield entry.path, relative_path, True
+                        stack.append((entry.path, relative_path))
+                    elif entry.is_file():
+                        yield entry.path, relative_path, False
+        except OSError as e:
+            logging.warning(f"Could not read directory {directory}: {e}")
+
+
 def get_theme_path(config) -> str:
     """Locate theme specified in config.json."""
     theme_name = config["theme"]
@@ -110,6 +489,11 @@ def get_theme_path(config) -> str:
     else:
         return str(theme_full_path)
 
+def get_cache_dir(config) -> Path:
+    """Locate the directory used for RevealPack's persistent build caches."""
+    source_root = Path(config["directories"]["source"]["root"])
+    return source_root / "cached" / ".revealpack"
+
 def cleanup_temp_files(files_list):
     """Delete specified files and remove their parent directories if they become empty.
     Cleanup errors are logged but will not cause program termination.
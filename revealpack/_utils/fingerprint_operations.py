@@ -0,0 +1,197 @@
+import os
+import re
+import json
+import time
+import logging
+import posixpath
+from functools import partial
+from html import unescape
+from urllib.parse import unquote, quote
+
+from .file_operations import copy_file, unshare_file, RACY_WINDOW_NS
+from .manifest_operations import hash_file
+
+ASSET_MANIFEST_NAME = "asset-manifest.json"
+ASSET_MANIFEST_VERSION = 1
+HASH_LENGTH = 10
+
+_REFERENCE_PATTERN = re.compile(
+    r'(?P<attr>\b(?:src|href|data-src|poster|data-background(?:-image|-video)?)\s*=\s*)'
+    r'(?P<quote>["\'])(?P<value>[^"\']*)(?P=quote)'
+    r'|(?P<url>url\(\s*)(?P<url_quote>["\']?)(?P<url_value>[^"\')]+)(?P=url_quote)(?=\s*\))',
+    re.IGNORECASE,
+)
+_EXTERNAL_PATTERN = re.compile(r'^(?:[a-z][a-z0-9+.-]*:|//|#)', re.IGNORECASE)
+
+
+def get_fingerprinted_name(relative_path, digest):
+    """Insert a shortened content hash before the file extension."""
+    stem, suffix = posixpath.splitext(relative_path)
+    return f"{stem}.{digest[:HASH_LENGTH]}{suffix}"
+
+
+def split_reference(value):
+    """
+    Split a reference into its local path relative to the build root and
+    the prefix and suffix to preserve when it is rewritten.
+
+    Returns (None, None, None) for external, absolute or escaping references.
+    """
+    value = value.strip()
+    if not value or _EXTERNAL_PATTERN.match(value) or value.startswith("/"):
+        return None, None, None
+    cut = len(value)
+    for marker in ("?", "#"):
+        index = value.find(marker)
+        if index != -1:
+            cut = min(cut, index)
+    path, suffix = value[:cut], value[cut:]
+    prefix = "./" if path.startswith("./") else ""
+    normalized = posixpath.normpath(unquote(unescape(path)).replace("\\", "/"))
+    if normalized.startswith("..") or normalized == ".":
+        return None, None, None
+    return normalized, prefix, suffix
+
+
+class AssetFingerprinter:
+    """
+    Publish content-hashed copies of the assets referenced by built HTML.
+
+    Referenced files get a copy named after their content hash in the same
+    directory, identical files share one hashed copy and the references in
+    the HTML files are rewritten to point at it. The original files are kept
+    so relative references inside CSS and JavaScript keep working. The
+    mapping is written to ``asset-manifest.json`` in the build directory.
+
+    HTML files that are not rebuilt still reference the hashed names of the
+    previous run, so the original each page referenced is recorded per page
+    in the state file. Identical files share a hashed name, so it could not
+    be recovered from the manifest alone.
+    """
+
+    def __init__(self, build_dir, state_path):
+        self.build_dir = str(build_dir)
+        self.manifest_path = os.path.join(self.build_dir, ASSET_MANIFEST_NAME)
+        self.state_path = str(state_path)
+        self.previous = self._load_json(self.manifest_path).get("assets", {})
+        state = self._load_json(self.state_path)
+        self.hashes = state.get("files", {})
+        # Hashed name -> original file for each HTML file, relative to the build directory
+        self.pages = state.get("pages", {})
+        # Pages without a record only resolve hashed names shared by no other file
+        self.reverse = {}
+        for original, hashed in self.previous.items():
+            self.reverse.setdefault(hashed, set()).add(original)
+
+    def _load_json(self, path):
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable file {path}: {e}")
+            return {}
+        return data if data.get("version") == ASSET_MANIFEST_VERSION else {}
+
+    def _write_json(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": ASSET_MANIFEST_VERSION, **data}, f, indent=2, sort_keys=True)
+        os.replace(temp_path, path)
+
+    def _digest(self, relative_path):
+        """Hash a build file, reusing the recorded hash while its stat data is unchanged."""
+        stat_result = os.stat(os.path.join(self.build_dir, relative_path))
+        key = [stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino]
+        entry = self.hashes.get(relative_path)
+        if entry and entry[:3] == key:
+            return entry[3]
+        digest = hash_file(os.path.join(self.build_dir, relative_path))
+        if time.time_ns() - stat_result.st_mtime_ns >= RACY_WINDOW_NS:
+            self.hashes[relative_path] = key + [digest]
+        return digest
+
+    def _resolve(self, value, page):
+        """Map a reference in an HTML file to the original build file it points at, or None."""
+        path, _, _ = split_reference(value)
+        if path is None:
+            return None
+        if page in self.pages:
+            path = self.pages[page].get(path, path)
+        elif len(self.reverse.get(path, ())) == 1:
+            path = next(iter(self.reverse[path]))
+        if path.lower().endswith((".html", ".htm")) or path == ASSET_MANIFEST_NAME:
+            return None
+        if not os.path.isfile(os.path.join(self.build_dir, path)):
+            return None
+        return path
+
+    def _page(self, html_file):
+        return os.path.relpath(html_file, self.build_dir).replace(os.sep, "/")
+
+    def run(self, html_files):
+        """Fingerprint the assets referenced by html_files and rewrite their references."""
+        contents = {}
+        referenced = set()
+        for html_file in html_files:
+            with open(html_file, "r", encoding="utf-8") as f:
+                contents[html_file] = f.read()
+            page = self._page(html_file)
+            for match in _REFERENCE_PATTERN.finditer(contents[html_file]):
+                path = self._resolve(match.group("value") if match.group("attr") else match.group("url_value"), page)
+                if path:
+                    referenced.add(path)
+
+        # Identical files share the hashed copy of the first one found
+        assets = {}
+        by_digest = {}
+        for path in sorted(referenced):
+            digest = self._digest(path)
+            if digest not in by_digest:
+                hashed = get_fingerprinted_name(path, digest)
+                hashed_file = os.path.join(self.build_dir, hashed)
+                if not os.path.exists(hashed_file):
+                    copy_file(os.path.join(self.build_dir, path), hashed_file)
+                by_digest[digest] = hashed
+            assets[path] = by_digest[digest]
+
+        pages = {}
+
+        def rewrite(page, match):
+            group = "value" if match.group("attr") else "url_value"
+            value = match.group(group)
+            path = self._resolve(value, page)
+            if path not in assets:
+                return match.group(0)
+            pages[page][assets[path]] = path
+            _, prefix, suffix = split_reference(value)
+            hashed = quote(assets[path], safe="/") if "%" in value else assets[path]
+            start, end = match.span(group)
+            whole_start = match.start()
+            text = match.group(0)
+            return text[:start - whole_start] + prefix + hashed + suffix + text[end - whole_start:]
+
+        for html_file, content in contents.items():
+            page = self._page(html_file)
+            pages[page] = {}
+            rewritten = _REFERENCE_PATTERN.sub(partial(rewrite, page), content)
+            if rewritten != content:
+                unshare_file(html_file)
+                with open(html_file, "w", encoding="utf-8") as f:
+                    f.write(rewritten)
+
+        # Remove hashed copies that are no longer referenced
+        current = set(assets.values())
+        for hashed in set(self.previous.values()) - current:
+            hashed_file = os.path.join(self.build_dir, hashed)
+            if os.path.isfile(hashed_file):
+                os.remove(hashed_file)
+                logging.debug(f"Removed stale fingerprinted asset {hashed_file}")
+
+        self.hashes = {path: entry for path, entry in self.hashes.items() if path in referenced}
+        self._write_json(self.state_path, {"files": self.hashes, "pages": pages})
+        self._write_json(self.manifest_path, {"assets": assets})
+        logging.info(f"Fingerprinted {len(assets)} assets as {len(current)} files.")
+        return assets
@@ -1,22 +1,213 @@
 import os
+import re
 import sys
+import json
 import shutil
+import hashlib
 import logging
 import platform
+import threading
 import subprocess
+from io import StringIO
+from itertools import accumulate
+from html import escape
+from html.parser import HTMLParser
+from queue import Queue, Empty
 from pathlib import Path
 
-from bs4 import BeautifulSoup
-from bs4.formatter import HTMLFormatter
+from .file_operations import copy_file_if_different, unshare_file
+from .profile_operations import span, get_profiler
 
 # -----------------------------------------------------------------------------
 # HTML formatting utility
 # -----------------------------------------------------------------------------
 
-def beautify_html(html_str, indent_size=2):
+HTML_FORMATTERS = ("bs4", "fast")
+
+VOID_ELEMENTS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+])
+PRESERVED_ELEMENTS = frozenset(["pre", "code", "textarea", "script", "style"])
+
+
+class StreamingHTMLFormatter(HTMLParser):
+    """
+    Indent HTML in a single streaming pass without building a DOM.
+
+    Tags and text are written one per line to ``write`` as they are parsed.
+    Text is collected until the next tag, so text split across several
+    ``feed()`` calls, such as around Jinja2 expressions, stays on one line.
+    The contents of ``pre``, ``code``, ``textarea``, ``script`` and ``style``
+    elements are written unchanged. Other text is written with ``&``, ``<``
+    and ``>`` escaped, so escaped markup stays text; other entities and
+    character references are written as the characters they stand for.
+    """
+
+    def __init__(self, write, indent_size=2):
+        super().__init__(convert_charrefs=True)
+        self.write = write
+        self.indent = " " * indent_size
+        self.stack = []
+        self.preserve_tag = None
+        self.preserve_depth = 0
+        self.text = []
+
+    def _line(self, text):
+        self.write(f"{self.indent * len(self.stack)}{text}\n")
+
+    def _flush_text(self):
+        if not self.text:
+            return
+        text = "".join(self.text).strip()
+        self.text = []
+        if text:
+            self._line(escape(text, quote=False))
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        start_tag = self.get_starttag_text()
+        if self.preserve_tag:
+            if tag == self.preserve_tag:
+                self.preserve_depth += 1
+            self.write(start_tag)
+        elif tag in PRESERVED_ELEMENTS:
+            self.write(f"{self.indent * len(self.stack)}{start_tag}")
+            self.preserve_tag = tag
+            self.preserve_depth = 1
+        elif tag in VOID_ELEMENTS:
+            self._line(start_tag)
+        else:
+            self._line(start_tag)
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush_text()
+        if self.preserve_tag:
+            self.write(self.get_starttag_text())
+        else:
+            self._line(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if self.preserve_tag:
+            self.write(f"</{tag}>")
+            if tag == self.preserve_tag:
+                self.preserve_depth -= 1
+                if self.preserve_depth == 0:
+                    self.preserve_tag = None
+                    self.write("\n")
+            return
+        if tag in self.stack:
+            while self.stack.pop() != tag:
+                pass
+        self._line(f"</{tag}>")
+
+    def handle_data(self, data):
+        if self.preserve_tag in ("script", "style"):
+            self.write(data)
+        elif self.preserve_tag:
+            self.write(escape(data, quote=False))
+        else:
+            self.text.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+        if self.preserve_tag:
+            self.write(f"<!--{data}-->")
+        else:
+            self._line(f"<!--{data}-->")
+
+    def handle_decl(self, decl):
+        self._flush_text()
+        self._line(f"<!{decl}>")
+
+    def handle_pi(self, data):
+        self._flush_text()
+        self._line(f"<?{data}>")
+
+    def unknown_decl(self, data):
+        self._flush_text()
+        # HTMLParser passes CDATA sections without their closing "]]"
+        if data.upper().startswith("CDATA["):
+            self._line(f"<![{data}]]>")
+        else:
+            self._line(f"<![{data}]>")
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        if self.preserve_tag:
+            self.write("\n")
+            self.preserve_tag = None
+
+
+def fast_beautify_html(html_str, indent_size=2, write=None):
+    """
+    Beautify an HTML string with ``StreamingHTMLFormatter``.
+
+    If ``write`` is given, the output is passed to it piece by piece and
+    None is returned; otherwise the formatted HTML is returned as a string.
+    """
+    buffer = None
+    if write is None:
+        buffer = StringIO()
+        write = buffer.write
+    formatter = StreamingHTMLFormatter(write, indent_size)
+    formatter.feed(html_str)
+    formatter.close()
+    return buffer.getvalue() if buffer is not None else None
+
+
+def beautify_html(html_str, indent_size=2, formatter="bs4"):
     """
     Beautify an HTML string using BeautifulSoup's prettify method.
+
+    Pass ``formatter="fast"`` to use the single pass ``fast_beautify_html``.
+    """
+    with span("beautify_html", "html", formatter=formatter, size=len(html_str)):
+        if formatter == "fast":
+            return fast_beautify_html(html_str, indent_size)
+        return prettify_html(html_str, indent_size)
+
+
+def write_beautified_html(chunks, output_path, indent_size=2, formatter="bs4"):
     """
+    Beautify HTML produced in chunks, such as by Jinja2's ``Template.generate``,
+    and write it to ``output_path``.
+
+    The fast formatter formats each chunk as it arrives, so the document is
+    never held in memory as a whole. The output is written to a temporary
+    file and moved into place, replacing rather than writing through hard
+    links.
+    """
+    temp_path = f"{output_path}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            with span("beautify_html", "html", formatter=formatter):
+                if formatter == "fast":
+                    html_formatter = StreamingHTMLFormatter(f.write, indent_size)
+                    for chunk in chunks:
+                        # Jinja2 yields Markup chunks, which would escape the parser's buffer when appended
+                        html_formatter.feed(str(chunk))
+                    html_formatter.close()
+                else:
+                    f.write(prettify_html("".join(chunks), indent_size))
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def prettify_html(html_str, indent_size=2):
+    """
+    Beautify an HTML string with BeautifulSoup, restoring <pre> and <code> elements.
+    """
+    # Imported here so builds that do not use this formatter start faster
+    from bs4 import BeautifulSoup
+    from bs4.formatter import HTMLFormatter
+
     # Parse the HTML with BeautifulSoup
     soup = BeautifulSoup(html_str, "html.parser")
     
@@ -45,6 +236,96 @@ def beautify_html(html_str, indent_size=2):
     
     return str(soup_beautified)
 
+
+class SlideSectionParser(HTMLParser):
+    """
+    Locate the top-level ``<section>`` elements of a Reveal.js ``.slides`` container.
+
+    ``spans`` receives the (start, end) character offsets of each section,
+    including its start and end tags. Nested sections (vertical slides) are
+    part of their parent section.
+    """
+
+    def __init__(self, html_str):
+        super().__init__(convert_charrefs=False)
+        self.html_str = html_str
+        # Offset of the start of each line, HTMLParser.getpos() only counts "\n"
+        self.line_offsets = list(accumulate((len(line) + 1 for line in html_str.split("\n")[:-1]), initial=0))
+        self.spans = []
+        self.slides_depth = None
+        self.slides_closed = False
+        self.div_depth = 0
+        self.section_depth = 0
+        self.section_start = None
+
+    def _offset(self):
+        line, column = self.getpos()
+        return self.line_offsets[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "div":
+            self.div_depth += 1
+            if self.slides_depth is None and "slides" in (dict(attrs).get("class") or "").split():
+                self.slides_depth = self.div_depth
+        elif tag == "section" and self.slides_depth is not None and not self.slides_closed:
+            if self.section_depth == 0:
+                self.section_start = self._offset()
+            self.section_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "div":
+            if self.div_depth == self.slides_depth and not self.slides_closed:
+                self.slides_closed = True
+            self.div_depth -= 1
+        elif tag == "section" and self.section_depth > 0:
+            self.section_depth -= 1
+            if self.section_depth == 0:
+                end = self.html_str.index(">", self._offset()) + 1
+                self.spans.append((self.section_start, end))
+
+
+def split_slide_sections(html_str):
+    """
+    Split deck HTML into its top-level slide sections and the remaining page.
+
+    Returns:
+        tuple: (skeleton, sections) where ``skeleton`` is the HTML with every
+        section removed and ``sections`` lists the HTML of each section
+    """
+    parser = SlideSectionParser(html_str)
+    parser.feed(html_str)
+    parser.close()
+    skeleton = []
+    sections = []
+    position = 0
+    for start, end in parser.spans:
+        skeleton.append(html_str[position:start])
+        sections.append(html_str[start:end])
+        position = end
+    skeleton.append(html_str[position:])
+    return "".join(skeleton), sections
+
+
+def diff_slide_sections(old_html, new_html):
+    """
+    Compare two builds of a deck slide by slide.
+
+    Returns:
+        tuple or None: The number of top-level sections and the (index, html)
+        of each changed one, or None if anything outside the sections or the
+        number of sections changed
+    """
+    old_skeleton, old_sections = split_slide_sections(old_html)
+    new_skeleton, new_sections = split_slide_sections(new_html)
+    if old_skeleton != new_skeleton or len(old_sections) != len(new_sections):
+        return None
+    changes = [
+        (index, new_section)
+        for index, (old_section, new_section) in enumerate(zip(old_sections, new_sections))
+        if old_section != new_section
+    ]
+    return len(new_sections), changes
+
 # -----------------------------------------------------------------------------
 # SCSS compilation using Dart Sass CLI
 # -----------------------------------------------------------------------------
@@ -77,14 +358,559 @@ def compile_scss(input_file, output_file):
     """
     sass = _resolve_sass_cli()
     try:
-        subprocess.run(
-            [sass, "--no-source-map", input_file, output_file],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        with span(f"sass {os.path.basename(input_file)}", "sass", input=str(input_file)):
+            subprocess.run(
+                [sass, "--no-source-map", input_file, output_file],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
         logging.info(f"✅ Compiled SCSS: {input_file} → {output_file}")
     except subprocess.CalledProcessError as e:
         logging.error("❌ Sass compilation failed:\n%s", e.stderr or e.stdout)
         sys.exit(e.returncode)
+
+def compile_scss_batch(pairs, persistent=False):
+    """
+    Compile several SCSS files to CSS in a single Dart Sass CLI invocation.
+
+    Parameters:
+    - pairs (list of tuple): (input_file, output_file) pairs to compile.
+    - persistent (bool): Use the shared embedded compiler process when available.
+
+    If the batch fails, each file is compiled on its own so that errors are
+    reported against the file that caused them. While profiling, files are
+    compiled one at a time by an embedded Sass process started for the batch
+    (or by one CLI process each if unavailable), so the trace has a span per
+    stylesheet.
+    """
+    if not pairs:
+        return
+    # Never let Sass write through a hard link into a source or cached file
+    for _, dest in pairs:
+        unshare_file(dest)
+    if persistent:
+        compiler = get_persistent_compiler()
+        if compiler is not None:
+            _compile_scss_persistent(compiler, pairs)
+            return
+    elif get_profiler() is not None:
+        compiler = _start_embedded_compiler()
+        if compiler is not None:
+            try:
+                _compile_scss_persistent(compiler, pairs)
+            finally:
+                compiler.close()
+            return
+    _compile_scss_cli(pairs)
+
+
+def _compile_scss_cli(pairs):
+    sass = _resolve_sass_cli()
+    try:
+        if get_profiler() is not None:
+            for src, dest in pairs:
+                with span(f"sass {os.path.basename(src)}", "sass", input=str(src)):
+                    subprocess.run(
+                        [sass, "--no-source-map", f"{src}:{dest}"],
+                        check=True,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        text=True
+                    )
+        else:
+            with span("sass batch", "sass", inputs=[str(src) for src, _ in pairs]):
+                subprocess.run(
+                    [sass, "--no-source-map"] + [f"{src}:{dest}" for src, dest in pairs],
+                    check=True,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True
+                )
+        for src, dest in pairs:
+            logging.info(f"✅ Compiled SCSS: {src} → {dest}")
+    except subprocess.CalledProcessError as e:
+        logging.error("❌ Sass batch compilation failed, compiling files individually to locate errors...")
+        for src, dest in pairs:
+            result = subprocess.run(
+                [sass, "--no-source-map", src, dest],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+            if result.returncode:
+                logging.error("❌ Sass compilation failed for %s:\n%s", src, result.stderr or result.stdout)
+            else:
+                logging.info(f"✅ Compiled SCSS: {src} → {dest}")
+        sys.exit(e.returncode)
+
+
+class ScssBatch:
+    """
+    Collect SCSS compilations from several build steps and run them together.
+
+    Steps that stage temporary files for compilation register their cleanup
+    with ``after_compile`` so it runs once the batch has been compiled, and
+    may pass ``on_success`` to ``add`` to act on a compiled file. When
+    ``persistent`` is set, the batch is compiled by the shared embedded Sass
+    process instead of a new Dart Sass CLI process.
+    """
+
+    def __init__(self, persistent=False):
+        self.persistent = persistent
+        self.pairs = []
+        self.callbacks = []
+        self.success_callbacks = []
+
+    def add(self, input_file, output_file, on_success=None):
+        self.pairs.append((str(input_file), str(output_file)))
+        if on_success is not None:
+            self.success_callbacks.append(on_success)
+
+    def after_compile(self, callback, *args):
+        self.callbacks.append((callback, args))
+
+    def compile(self):
+        """Compile every queued file, then run the registered callbacks."""
+        if self.pairs:
+            logging.info(f"Compiling {len(self.pairs)} SCSS file(s)...")
+        try:
+            compile_scss_batch(self.pairs, self.persistent)
+            for callback in self.success_callbacks:
+                callback()
+        finally:
+            # Staged files are removed even if compilation fails
+            for callback, args in self.callbacks:
+                callback(*args)
+            self.pairs = []
+            self.callbacks = []
+            self.success_callbacks = []
+
+# -----------------------------------------------------------------------------
+# Persistent SCSS compilation using the Dart Sass embedded protocol
+# -----------------------------------------------------------------------------
+#
+# `sass --embedded` keeps a single compiler process alive and accepts compile
+# requests over stdin/stdout. Each packet is a varint length, a varint
+# compilation ID and a protobuf message. Only the handful of fields RevealPack
+# needs are encoded here, so no protobuf dependency is required.
+
+_EMBEDDED_START_TIMEOUT = 10
+
+
+def _encode_varint(value):
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _decode_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _encode_field(number, value):
+    """Encode a protobuf field: bytes/str/messages as length-delimited, ints and bools as varints."""
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    if isinstance(value, bytes):
+        return _encode_varint(number << 3 | 2) + _encode_varint(len(value)) + value
+    return _encode_varint(number << 3) + _encode_varint(int(value))
+
+
+def _decode_message(data):
+    """Decode a protobuf message into a mapping of field number to a list of raw values."""
+    fields = {}
+    pos = 0
+    while pos < len(data):
+        key, pos = _decode_varint(data, pos)
+        number, wire_type = key >> 3, key & 0x07
+        if wire_type == 0:
+            value, pos = _decode_varint(data, pos)
+        elif wire_type == 2:
+            length, pos = _decode_varint(data, pos)
+            value = data[pos:pos + length]
+            pos += length
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        fields.setdefault(number, []).append(value)
+    return fields
+
+
+class EmbeddedSassError(Exception):
+    """Raised when the embedded Sass process fails or violates the protocol."""
+
+
+class EmbeddedSassCompiler:
+    """
+    A long-lived Dart Sass compiler driven through the embedded protocol.
+
+    The process is started once and reused for every compilation, so repeated
+    builds in the same Python process do not pay Dart Sass startup costs.
+    """
+
+    def __init__(self, sass):
+        self.sass = sass
+        self.process = None
+        self.version = None
+        self._packets = Queue()
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def start(self):
+        """Start the compiler and confirm it speaks the embedded protocol."""
+        try:
+            self.process = subprocess.Popen(
+                [self.sass, "--embedded"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            raise EmbeddedSassError(f"Could not start embedded Sass: {e}")
+        threading.Thread(target=self._read_packets, daemon=True).start()
+        # VersionRequest is InboundMessage field 7 and always uses compilation ID 0
+        self._send(0, _encode_field(7, _encode_field(1, 0)))
+        compilation_id, message = self._receive(_EMBEDDED_START_TIMEOUT)
+        response = message.get(8)
+        if response is None:
+            raise EmbeddedSassError("Sass did not answer the embedded protocol version request.")
+        version = _decode_message(response[0])
+        self.version = version.get(3, [b""])[0].decode("utf-8")
+
+    def _read_packets(self):
+        stream = self.process.stdout
+        try:
+            while True:
+                header = self._read_varint(stream)
+                if header is None:
+                    break
+                packet = stream.read(header)
+                if len(packet) < header:
+                    break
+                compilation_id, pos = _decode_varint(packet, 0)
+                self._packets.put((compilation_id, _decode_message(packet[pos:])))
+        except (OSError, ValueError, IndexError):
+            pass
+        self._packets.put(None)
+
+    @staticmethod
+    def _read_varint(stream):
+        result = 0
+        shift = 0
+        while True:
+            byte = stream.read(1)
+            if not byte:
+                return None
+            result |= (byte[0] & 0x7F) << shift
+            if not byte[0] & 0x80:
+                return result
+            shift += 7
+
+    def _send(self, compilation_id, message):
+        payload = _encode_varint(compilation_id) + message
+        try:
+            self.process.stdin.write(_encode_varint(len(payload)) + payload)
+            self.process.stdin.flush()
+        except OSError as e:
+            raise EmbeddedSassError(f"Embedded Sass process is not accepting requests: {e}")
+
+    def _receive(self, timeout=None):
+        try:
+            packet = self._packets.get(timeout=timeout)
+        except Empty:
+            raise EmbeddedSassError("Timed out waiting for the embedded Sass process.")
+        if packet is None:
+            raise EmbeddedSassError("Embedded Sass process exited unexpectedly.")
+        compilation_id, message = packet
+        if 1 in message:
+            error = _decode_message(message[1][0])
+            detail = error.get(3, [b""])[0].decode("utf-8")
+            raise EmbeddedSassError(f"Embedded Sass protocol error: {detail}")
+        return packet
+
+    def compile(self, input_file, output_file):
+        """
+        Compile a single SCSS file and write the CSS to ``output_file``.
+
+        Returns:
+        tuple: (success, error message, list of loaded URLs)
+        """
+        with self._lock:
+            compilation_id = self._next_id
+            self._next_id += 1
+            request = b"".join([
+                _encode_field(3, os.path.abspath(input_file)),  # path
+                _encode_field(13, True),  # charset, matching the CLI default
+            ])
+            self._send(compilation_id, _encode_field(2, request))
+            while True:
+                received_id, message = self._receive()
+                if 3 in message:
+                    self._log_event(_decode_message(message[3][0]))
+                    continue
+                if received_id == compilation_id and 2 in message:
+                    break
+                raise EmbeddedSassError("Unexpected message from the embedded Sass process.")
+
+        response = _decode_message(message[2][0])
+        loaded_urls = [url.decode("utf-8") for url in response.get(4, [])]
+        if 2 in response:
+            success = _decode_message(response[2][0])
+            css = success.get(1, [b""])[0].decode("utf-8")
+            os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+            with open(output_file, "w", encoding="utf-8") as f:
+                f.write(css)
+            return True, None, loaded_urls
+        failure = _decode_message(response.get(3, [b""])[0])
+        formatted = failure.get(4) or failure.get(1) or [b"Unknown Sass error"]
+        return False, formatted[0].decode("utf-8"), loaded_urls
+
+    @staticmethod
+    def _log_event(event):
+        formatted = event.get(6) or event.get(3) or [b""]
+        message = formatted[0].decode("utf-8")
+        if event.get(2, [0])[0] == 2:
+            logging.debug(message)
+        else:
+            logging.warning(message)
+
+    def close(self):
+        if self.process and self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+        self.process = None
+
+
+_persistent_compiler = None
+_persistent_unavailable = False
+
+
+def get_persistent_compiler():
+    """
+    Return the shared embedded Sass compiler, starting it on first use.
+
+    Returns None if the installed Sass does not support `--embedded`, in which
+    case callers fall back to one-shot CLI compilation.
+    """
+    global _persistent_compiler
+    if _persistent_compiler is not None:
+        if _persistent_compiler.process and _persistent_compiler.process.poll() is None:
+            return _persistent_compiler
+        _persistent_compiler = None
+    compiler = _start_embedded_compiler()
+    if compiler is not None:
+        logging.info(f"Started persistent Sass compiler {compiler.version}".rstrip())
+        _persistent_compiler = compiler
+    return compiler
+
+
+def _start_embedded_compiler():
+    """Start an embedded Sass compiler, or return None if Sass does not support it."""
+    global _persistent_unavailable
+    if _persistent_unavailable:
+        return None
+    compiler = EmbeddedSassCompiler(_resolve_sass_cli())
+    try:
+        compiler.start()
+    except EmbeddedSassError as e:
+        logging.info(f"Embedded Sass compiler unavailable, using one-shot compilation ({e})")
+        compiler.close()
+        _persistent_unavailable = True
+        return None
+    return compiler
+
+
+def close_persistent_compiler():
+    """Stop the shared embedded Sass compiler if it is running."""
+    global _persistent_compiler
+    if _persistent_compiler is not None:
+        _persistent_compiler.close()
+        _persistent_compiler = None
+
+
+def _compile_scss_persistent(compiler, pairs):
+    failed = False
+    for index, (src, dest) in enumerate(pairs):
+        try:
+            with span(f"sass {os.path.basename(src)}", "sass", input=str(src)):
+                success, message, _ = compiler.compile(src, dest)
+        except EmbeddedSassError as e:
+            logging.warning(f"Embedded Sass compiler failed ({e}), falling back to one-shot compilation.")
+            if compiler is _persistent_compiler:
+                close_persistent_compiler()
+            _compile_scss_cli(pairs[index:])
+            break
+        if success:
+            logging.info(f"✅ Compiled SCSS: {src} → {dest}")
+        else:
+            failed = True
+            logging.error("❌ Sass compilation failed for %s:\n%s", src, message)
+    if failed:
+        sys.exit(1)
+
+# -----------------------------------------------------------------------------
+# Compiled CSS cache keyed by the SCSS import closure
+# -----------------------------------------------------------------------------
+
+_SCSS_LOAD_RULE = re.compile(r"@(?:import|use|forward)\s+([^;{]+)")
+_SCSS_LOAD_URL = re.compile(r"""["']([^"']+)["']""")
+_SCSS_EXTENSIONS = (".scss", ".sass", ".css")
+
+
+def get_sass_version(cache_dir):
+    """
+    Return the version string of the Dart Sass CLI.
+
+    The version is cached against the size and modification time of the Sass
+    executable, so `sass --version` only runs when Sass itself changes.
+    """
+    sass = _resolve_sass_cli()
+    stat = os.stat(sass)
+    identity = [os.path.abspath(sass), stat.st_size, stat.st_mtime_ns]
+    version_path = os.path.join(cache_dir, "sass_version.json")
+    try:
+        with open(version_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("sass") == identity:
+            return cached["version"]
+    except (OSError, ValueError, KeyError):
+        pass
+    result = subprocess.run(
+        [sass, "--version"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    version = result.stdout.strip()
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(version_path, "w", encoding="utf-8") as f:
+        json.dump({"sass": identity, "version": version}, f)
+    return version
+
+
+def _resolve_scss_load(url, base_dirs):
+    """Resolve an @import/@use/@forward URL the way Sass's filesystem importer does."""
+    if url.startswith(("sass:", "http://", "https://", "//")):
+        return None
+    for base_dir in base_dirs:
+        path = Path(base_dir) / url
+        if path.suffix in _SCSS_EXTENSIONS:
+            candidates = [path, path.with_name(f"_{path.name}")]
+        else:
+            candidates = [
+                path.with_name(f"{prefix}{path.name}{ext}")
+                for ext in _SCSS_EXTENSIONS
+                for prefix in ("", "_")
+            ]
+            candidates += [path / f"{prefix}index{ext}" for ext in _SCSS_EXTENSIONS for prefix in ("_", "")]
+        for candidate in candidates:
+            if candidate.is_file():
+                return candidate
+    return None
+
+
+def get_scss_dependencies(entry_file, staged_dir=None):
+    """
+    Collect an SCSS file and every file it transitively loads.
+
+    Parameters:
+    - entry_file (str or Path): The stylesheet to compile.
+    - staged_dir (str or Path, optional): Directory the entry file's folder is
+      copied into for compilation. Loads from that folder are resolved against
+      ``staged_dir`` first, matching what Sass sees after staging.
+
+    Returns:
+    list: (path or unresolved URL, content) pairs in discovery order.
+    """
+    entry_file = Path(entry_file)
+    source_dir = entry_file.parent.resolve()
+    dependencies = []
+    seen = set()
+    pending = [entry_file]
+    while pending:
+        current = pending.pop()
+        resolved = current.resolve()
+        if resolved in seen:
+            continue
+        seen.add(resolved)
+        content = current.read_bytes()
+        dependencies.append((str(resolved), content))
+        base_dirs = [current.parent]
+        if staged_dir is not None and current.parent.resolve() == source_dir:
+            base_dirs.insert(0, Path(staged_dir))
+        text = content.decode("utf-8", errors="replace")
+        for rule in _SCSS_LOAD_RULE.finditer(text):
+            urls = _SCSS_LOAD_URL.findall(rule.group(1))
+            if not urls and current.suffix == ".sass":
+                # The indented syntax allows unquoted @import URLs
+                urls = [url.strip() for url in rule.group(1).splitlines()[0].split(",")]
+            for url in urls:
+                dependency = _resolve_scss_load(url, base_dirs)
+                if dependency is None:
+                    dependencies.append((f"unresolved:{url}", b""))
+                else:
+                    pending.append(dependency)
+    return dependencies
+
+
+class CssCache:
+    """
+    Cache of compiled CSS files.
+
+    Entries are keyed by the Sass version and the contents of a stylesheet's
+    import closure, so unchanged stylesheets are copied from the cache rather
+    than recompiled.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = str(cache_dir)
+        self._sass_version = None
+
+    def key(self, entry_file, staged_dir=None):
+        if self._sass_version is None:
+            self._sass_version = get_sass_version(self.cache_dir)
+        digest = hashlib.sha256(self._sass_version.encode("utf-8"))
+        for path, content in get_scss_dependencies(entry_file, staged_dir):
+            digest.update(path.encode("utf-8"))
+            digest.update(hashlib.sha256(content).digest())
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.css")
+
+    def fetch(self, key, output_file):
+        """Copy the cached CSS for ``key`` to ``output_file``. Returns False on a cache miss."""
+        cached = self._entry_path(key)
+        if not os.path.exists(cached):
+            return False
+        copy_file_if_different(cached, str(output_file))
+        return True
+
+    def store(self, key, output_file):
+        """Record a freshly compiled ``output_file`` under ``key``."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{self._entry_path(key)}.tmp"
+        shutil.copyfile(output_file, temp_path)
+        os.replace(temp_path, self._entry_path(key))
@@ -0,0 +1,79 @@
+import os
+import json
+import hashlib
+import logging
+
+MANIFEST_VERSION = 1
+
+
+def hash_bytes(data):
+    """Return the hex SHA-256 digest of a bytes or str object."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path, chunk_size=1 << 20):
+    """Return the hex SHA-256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """
+    Persisted record of the inputs and outputs of previously built decks.
+
+    The manifest is stored as JSON and maps each deck folder to the
+    fingerprint of its inputs along with the metadata needed to regenerate
+    the table of contents without re-rendering the deck.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.decks = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """Load the manifest from disk, discarding it if unreadable or outdated."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable build manifest {self.path}: {e}")
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            logging.info("Build manifest version changed, all decks will be rebuilt.")
+            return
+        self.decks = data.get("decks", {})
+
+    def get_deck(self, name):
+        return self.decks.get(name)
+
+    def set_deck(self, name, entry):
+        self.decks[name] = entry
+        self.dirty = True
+
+    def prune(self, names):
+        """Drop entries for decks that no longer exist in the presentation root."""
+        for name in list(self.decks):
+            if name not in names:
+                del self.decks[name]
+                self.dirty = True
+
+    def save(self):
+        """Write the manifest to disk if it changed."""
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "decks": self.decks}, f, indent=2)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+        logging.debug(f"Saved build manifest to {self.path}")
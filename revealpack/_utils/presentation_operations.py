@@ -1,5 +1,10 @@
-import yaml
+import os
+import re
+import json
 import logging
+from datetime import date, datetime
+
+from .manifest_operations import hash_bytes
 
 
 def validate_and_extract_sectiontitle(attributes):
@@ -52,36 +57,211 @@ def validate_titlepage(titlepage):
         titlepage["byinfo"] = byinfo
 
 
-def parse_slide(file_path):
-    """Parse an HTML slide and return its attributes and content."""
-    logging.info(f"  Parsing file: {file_path}...")
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+# Lines consisting of "---" and surrounding whitespace toggle the YAML header
+_DELIMITER_PATTERN = re.compile(r"^[^\S\n]*---[^\S\n]*$", re.MULTILINE)
+SLIDE_CACHE_VERSION = 2
 
-    # Extract YAML header
-    yaml_header = []
+# Tags of the JSON objects standing for values JSON has no type for
+_DATETIME_TAG = "__datetime__"
+_DATE_TAG = "__date__"
+_DICT_TAG = "__dict__"
+
+
+def split_front_matter(text):
+    """
+    Split slide text into its YAML header and HTML content in a single pass.
+
+    Every ``---`` line toggles between header and content, so a file may
+    contain several header blocks. Header lines are joined with newlines
+    like the line-by-line parser this replaces, while content is kept as is.
+
+    Returns:
+        tuple: (header, content) strings
+    """
+    if "---" not in text:
+        return "", text
+    header_lines = []
     content = []
     in_header = False
-    for line in lines:
-        if line.strip() == "---":
-            in_header = not in_header
-        elif in_header:
-            yaml_header.append(line)
+    position = 0
+    for match in _DELIMITER_PATTERN.finditer(text):
+        segment = text[position:match.start()]
+        if in_header:
+            header_lines.extend(_split_lines(segment))
         else:
-            content.append(line)
+            content.append(segment)
+        in_header = not in_header
+        # Skip the delimiter line including its newline
+        position = match.end() + 1
+    segment = text[position:]
+    if in_header:
+        header_lines.extend(_split_lines(segment))
+    else:
+        content.append(segment)
+    return "\n".join(header_lines), "".join(content)
+
+
+def _split_lines(segment):
+    """Split on newlines only, keeping them, like ``readlines`` does."""
+    lines = segment.split("\n")
+    result = [line + "\n" for line in lines[:-1]]
+    if lines[-1]:
+        result.append(lines[-1])
+    return result
+
+
+def load_front_matter(header):
+    """Parse a YAML header with the C loader when PyYAML was built with LibYAML."""
+    # Imported here so commands that do not parse slides start faster
+    import yaml
+
+    return yaml.load(header, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def encode_cache_value(value):
+    """
+    Convert a parsed YAML value to JSON-compatible data.
+
+    Dates and datetimes become tagged objects, and dicts that would be
+    mistaken for one are wrapped. Raises TypeError for values JSON cannot
+    round-trip, such as sets, tuples or non-string keys.
+    """
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    if isinstance(value, date):
+        return {_DATE_TAG: value.isoformat()}
+    if isinstance(value, list):
+        return [encode_cache_value(item) for item in value]
+    if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        encoded = {key: encode_cache_value(item) for key, item in value.items()}
+        if len(encoded) == 1 and next(iter(encoded)) in (_DATETIME_TAG, _DATE_TAG, _DICT_TAG):
+            return {_DICT_TAG: encoded}
+        return encoded
+    raise TypeError(f"Cannot store {type(value).__name__} in the slide cache")
+
+
+def _decode_cache_object(data):
+    """``json.load`` object hook reversing ``encode_cache_value``."""
+    if len(data) == 1:
+        key, value = next(iter(data.items()))
+        if key == _DATETIME_TAG:
+            return datetime.fromisoformat(value)
+        if key == _DATE_TAG:
+            return date.fromisoformat(value)
+        if key == _DICT_TAG:
+            return value
+    return data
+
+
+class SlideCache:
+    """
+    Persisted parse results for the slides of one deck.
+
+    Entries map each slide path to the hash of its text and the parsed
+    attributes, content and sectiontitle. The cache is stored as JSON, with
+    YAML dates and datetimes encoded by ``encode_cache_value``; slides whose
+    headers hold other values JSON cannot store are not cached. Unreadable
+    or malformed cache files are treated as empty.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.entries = {}
+        self.seen = set()
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f, object_hook=_decode_cache_object)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable slide cache {self.path}: {e}")
+            return
+        if not isinstance(data, dict) or data.get("version") != SLIDE_CACHE_VERSION:
+            return
+        slides = data.get("slides")
+        if not isinstance(slides, dict):
+            return
+        self.entries = {
+            file_path: (entry[0], entry[1])
+            for file_path, entry in slides.items()
+            if isinstance(entry, list) and len(entry) == 2 and isinstance(entry[1], dict)
+        }
+
+    def get(self, file_path, digest):
+        self.seen.add(file_path)
+        entry = self.entries.get(file_path)
+        if entry is not None and entry[0] == digest:
+            return entry[1]
+        return None
+
+    def set(self, file_path, digest, result):
+        self.seen.add(file_path)
+        self.entries[file_path] = (digest, result)
+        self.dirty = True
+
+    def save(self):
+        """Write the cache to disk, dropping slides that were not parsed this build."""
+        for file_path in list(self.entries):
+            if file_path not in self.seen:
+                del self.entries[file_path]
+                self.dirty = True
+        self.seen = set()
+        if not self.dirty:
+            return
+        slides = {}
+        for file_path, (digest, result) in self.entries.items():
+            try:
+                slides[file_path] = [digest, encode_cache_value(result)]
+            except TypeError as e:
+                logging.debug(f"Not caching {file_path}: {e}")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": SLIDE_CACHE_VERSION, "slides": slides}, f)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+
+def parse_slide(file_path, cache=None):
+    """
+    Parse an HTML slide and return its attributes and content.
+
+    When a ``SlideCache`` is given, slides whose text is unchanged since they
+    were cached are returned without parsing their YAML header again.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    digest = None
+    if cache is not None:
+        digest = hash_bytes(text)
+        cached = cache.get(file_path, digest)
+        if cached is not None:
+            logging.info(f"  Using cached parse of {file_path}.")
+            return cached
+
+    logging.info(f"  Parsing file: {file_path}...")
+    yaml_header, content = split_front_matter(text)
+
+    import yaml
 
     try:
-        attributes = yaml.safe_load("\n".join(yaml_header))
+        attributes = load_front_matter(yaml_header)
     except yaml.scanner.ScannerError as e:
         logging.error(f"Error in file: {file_path}")
-        logging.error(f"YAML header causing the issue: {yaml_header}")
+        logging.error(f"YAML header causing the issue: {yaml_header.splitlines(keepends=True)}")
         raise e
     if not attributes:
         attributes = {}
     # Validate and extract 'sectiontitle' if it exists
     sectiontitle = validate_and_extract_sectiontitle(attributes)
-    # Fix: strip trailing newlines from each line before joining to prevent double newlines
-    result = {"attributes": attributes, "content": "".join(content)}
+    result = {"attributes": attributes, "content": content}
     if sectiontitle:
         result["sectiontitle"] = sectiontitle
 
@@ -90,6 +270,8 @@ def parse_slide(file_path):
         content_preview = result["content"][:200] + "..." if len(result["content"]) > 200 else result["content"]
         logging.debug(f"  Content preview for {file_path}: {repr(content_preview)}")
 
+    if cache is not None:
+        cache.set(file_path, digest, result)
     return result
 
 
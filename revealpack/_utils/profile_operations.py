@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+
+_profiler = None
+_disabled = nullcontext()
+
+
+class Profiler:
+    """
+    Collect timing spans and counters in the Chrome trace event format.
+
+    The resulting JSON file can be opened in ``chrome://tracing`` or
+    https://ui.perfetto.dev. Timestamps are wall-clock microseconds so events
+    recorded in worker processes line up with those of the parent process.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def add_span(self, name, category, start_us, duration_us, args=None):
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start_us,
+            "dur": duration_us,
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+        }
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            self.events.append({
+                "name": name,
+                "ph": "C",
+                "ts": time.time_ns() // 1000,
+                "pid": os.getpid(),
+                "args": {name: self.counters[name]},
+            })
+
+    def merge(self, events, counters=None):
+        """Add events and counter totals recorded by another process, such as a render worker."""
+        with self.lock:
+            self.events.extend(events)
+            for name, value in (counters or {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def save(self, path):
+        data = {
+            "traceEvents": sorted(self.events, key=lambda event: event["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": {"counters": self.counters},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        logging.info(f"Wrote build profile with {len(self.events)} events to {path}")
+
+
+def start_profiling():
+    """Start collecting profile events in this process and return the profiler."""
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def stop_profiling():
+    """Stop collecting profile events and return the profiler, or None if not profiling."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def get_profiler():
+    return _profiler
+
+
+@contextmanager
+def _span(profiler, name, category, args):
+    start_ns = time.time_ns()
+    try:
+        yield
+    finally:
+        end_ns = time.time_ns()
+        profiler.add_span(name, category, start_ns // 1000, (end_ns - start_ns) // 1000, args)
+
+
+def span(name, category="build", **args):
+    """Time the enclosed block as a trace span, doing nothing when not profiling."""
+    profiler = _profiler
+    if profiler is None:
+        return _disabled
+    return _span(profiler, name, category, args)
+
+
+def count(name, value=1):
+    """Add value to a trace counter, doing nothing when not profiling."""
+    profiler = _profiler
+    if profiler is not None:
+        profiler.count(name, value)
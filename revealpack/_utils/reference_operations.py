@@ -0,0 +1,142 @@
+import os
+import re
+import logging
+from collections import OrderedDict
+from html import unescape
+from urllib.parse import unquote
+
+from .manifest_operations import hash_bytes
+
+# Direct references found in a document, keyed by (libraries_dir, content hash),
+# least recently used first. Library HTML files shared by many decks are only
+# scanned once while they stay in the cache.
+_scan_cache = OrderedDict()
+SCAN_CACHE_SIZE = 1024
+_pattern_cache = {}
+
+
+def get_reference_patterns(libraries_dir):
+    """
+    Return the compiled patterns matching library references.
+
+    The first matches ``url()`` values, where quoted values may contain
+    parentheses and unquoted ones end at the first ``)``. The second matches
+    unquoted ``src``/``href``/``data-background`` attribute values and any
+    quoted string containing the libraries directory (which also covers
+    quoted attributes). They are applied separately because a quoted
+    ``style`` attribute can itself contain a ``url()``.
+    """
+    patterns = _pattern_cache.get(libraries_dir)
+    if patterns is None:
+        lib = re.escape(libraries_dir)
+        patterns = (
+            re.compile(
+                rf'url\(\s*(?:"(?P<double>[^"]*?{lib}/[^"]+)"'
+                rf'|\'(?P<single>[^\']*?{lib}/[^\']+)\''
+                rf'|(?P<url>[^"\')\s]*?{lib}/[^"\')\s]+))',
+                re.IGNORECASE,
+            ),
+            re.compile(
+                rf'(?:src|data-src|href|data-background(?:-image)?)\s*=\s*(?P<bare>[^\s>"\']*?{lib}/[^\s>]+)'
+                rf'|["\'](?P<quoted>[^"\'<>]*?{lib}/[^"\'<>]+)["\']',
+                re.IGNORECASE,
+            ),
+        )
+        _pattern_cache[libraries_dir] = patterns
+    return patterns
+
+
+def normalize_reference(value, libraries_dir):
+    """
+    Convert a raw reference to a posix path relative to the source root.
+
+    Returns None if no path component equals ``libraries_dir``.
+    """
+    path = unquote(value).replace('\\', '/').split('#')[0]
+    path_parts = path.split('/')
+    try:
+        lib_index = path_parts.index(libraries_dir)
+    except ValueError:
+        return None
+    relative_parts = path_parts[lib_index:]
+    return "/".join(relative_parts)
+
+
+def scan_references(html_content, libraries_dir):
+    """
+    Find the library files directly referenced by HTML content.
+
+    Results are memoized by content hash.
+
+    Returns:
+        frozenset: Paths relative to the source root, starting with ``libraries_dir``
+    """
+    key = (libraries_dir, hash_bytes(html_content))
+    references = _scan_cache.get(key)
+    if references is not None:
+        _scan_cache.move_to_end(key)
+        return references
+
+    html_content = unescape(html_content)
+    found = set()
+    for pattern in get_reference_patterns(libraries_dir):
+        for match in pattern.finditer(html_content):
+            relative_path = normalize_reference(match.group(match.lastgroup), libraries_dir)
+            if relative_path:
+                found.add(relative_path)
+    references = frozenset(found)
+    _scan_cache[key] = references
+    if len(_scan_cache) > SCAN_CACHE_SIZE:
+        _scan_cache.popitem(last=False)
+    return references
+
+
+class ReferenceGraph:
+    """
+    Graph of library references between documents.
+
+    Nodes are document names (decks, templates) and library files; edges are
+    direct references. Library HTML files are read and scanned the first time
+    they are reached, so their references are followed recursively. Each node
+    is visited once per traversal, which keeps circular includes safe.
+    """
+
+    def __init__(self, libraries_dir, source_root=None):
+        self.libraries_dir = libraries_dir
+        self.source_root = source_root
+        self.edges = {}
+
+    def add_document(self, name, html_content):
+        """Scan a document and record its direct references."""
+        self.edges[name] = scan_references(html_content, self.libraries_dir)
+        return self.edges[name]
+
+    def _references_of(self, node):
+        if node in self.edges:
+            return self.edges[node]
+        references = frozenset()
+        if self.source_root and node.endswith('.html'):
+            html_path = os.path.join(self.source_root, node)
+            try:
+                with open(html_path, 'r', encoding='utf-8') as f:
+                    references = scan_references(f.read(), self.libraries_dir)
+            except OSError:
+                pass
+            except UnicodeDecodeError as e:
+                logging.debug(f"Could not scan {html_path} for references: {e}")
+        self.edges[node] = references
+        return references
+
+    def closure(self, *names):
+        """Return every library file reachable from the given documents."""
+        reached = set()
+        stack = []
+        for name in names:
+            stack.extend(self._references_of(name))
+        while stack:
+            node = stack.pop()
+            if node in reached:
+                continue
+            reached.add(node)
+            stack.extend(self._references_of(node))
+        return reached
@@ -0,0 +1,483 @@
+import os
+import re
+import json
+import errno
+import logging
+import threading
+from queue import Queue, Empty
+from collections import OrderedDict
+from functools import partial
+from urllib.parse import urlsplit
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+# Precompressed siblings, in order of preference, as (Content-Encoding, suffix)
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+_BODY_END_PATTERN = re.compile(rb"</body\s*>", re.IGNORECASE)
+
+# URLs handled by the server itself rather than served from the build directory
+LIVE_RELOAD_PREFIX = "/__revealpack/"
+LIVE_RELOAD_EVENTS_PATH = LIVE_RELOAD_PREFIX + "events"
+LIVE_RELOAD_SCRIPT_PATH = LIVE_RELOAD_PREFIX + "live.js"
+LIVE_RELOAD_PING_INTERVAL = 15
+
+LIVE_RELOAD_SCRIPT = """\
+(function () {
+  var page = decodeURIComponent(location.pathname.split("/").pop()) || "index.html";
+  var source = new EventSource("%s");
+
+  function typeset(element) {
+    var highlight = window.Reveal && Reveal.getPlugin && Reveal.getPlugin("highlight");
+    if (highlight && highlight.highlightBlock) {
+      element.querySelectorAll("pre code").forEach(function (block) { highlight.highlightBlock(block); });
+    }
+    if (window.MathJax && MathJax.typesetPromise) {
+      MathJax.typesetPromise([element]);
+    } else if (window.MathJax && MathJax.Hub) {
+      MathJax.Hub.Queue(["Typeset", MathJax.Hub, element]);
+    } else if (window.renderMathInElement) {
+      renderMathInElement(element, (window.Reveal && Reveal.getConfig().katex) || {});
+    }
+  }
+
+  source.addEventListener("reload", function (event) {
+    var data = JSON.parse(event.data);
+    if (!data.page || data.page === page) {
+      location.reload();
+    }
+  });
+
+  source.addEventListener("slides", function (event) {
+    var data = JSON.parse(event.data);
+    if (data.page !== page) {
+      return;
+    }
+    var sections = document.querySelectorAll(".reveal .slides > section");
+    if (!window.Reveal || sections.length !== data.count) {
+      location.reload();
+      return;
+    }
+    var indices = Reveal.getIndices();
+    data.slides.forEach(function (slide) {
+      var template = document.createElement("template");
+      template.innerHTML = slide.html;
+      var section = template.content.firstElementChild;
+      sections[slide.index].replaceWith(section);
+      typeset(section);
+    });
+    Reveal.sync();
+    Reveal.slide(indices.h, indices.v, indices.f);
+  });
+})();
+""" % LIVE_RELOAD_EVENTS_PATH
+
+
+class FileCache:
+    """
+    Thread-safe LRU cache of small file contents, keyed by path.
+
+    Entries are only returned while the file's size and modification time
+    are unchanged, so rebuilt files are read again. The cache holds at most
+    ``max_bytes`` in total and only files up to ``max_file_size``.
+    """
+
+    def __init__(self, max_bytes=64 << 20, max_file_size=1 << 20):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, stat_result):
+        """Return the contents of path, reading it on a miss, or None if it is too large."""
+        if stat_result.st_size > self.max_file_size:
+            return None
+        key = (stat_result.st_size, stat_result.st_mtime_ns)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == key:
+                self.entries.move_to_end(path)
+                return entry[1]
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) != stat_result.st_size:
+            # Changed while reading, serve it without caching
+            return data
+        with self.lock:
+            previous = self.entries.pop(path, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self.entries[path] = (key, data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+        return data
+
+
+def parse_accept_encoding(header):
+    """
+    Parse an Accept-Encoding header into a {coding: q-value} dict.
+
+    Codings without a q-value get 1, malformed q-values count as 0.
+    """
+    qualities = {}
+    for part in header.split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities
+
+
+class LiveReload:
+    """
+    Publish build events to the browsers viewing the served pages.
+
+    Each connected page holds a server-sent events stream with its own
+    queue. ``reload`` events ask a page (or every page) to reload, and
+    ``slides`` events carry re-rendered slide sections to patch in place.
+    """
+
+    def __init__(self):
+        self.clients = set()
+        self.lock = threading.Lock()
+
+    def subscribe(self):
+        client = Queue()
+        with self.lock:
+            self.clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def publish(self, event, data):
+        message = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.put(message)
+        logging.debug(f"Sent '{event}' event to {len(clients)} pages")
+
+    def close(self):
+        """End every open event stream."""
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.put(None)
+
+
+class StaticRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serve files from the build directory for ``revealpack serve``.
+
+    Files are served with ``ETag`` and ``Last-Modified`` validators and
+    answered with 304 when unchanged, byte ranges are supported for seeking
+    in media, and ``.br``/``.gz`` siblings are sent to clients accepting
+    those encodings. Small files are served from a shared ``FileCache``.
+    With a ``LiveReload``, HTML pages load a script that follows its event
+    stream.
+    Responses ask browsers to revalidate on every load so rebuilt files are
+    always picked up, and requests are logged at debug level instead of to
+    stderr.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, *args, file_cache=None, live_reload=None, **kwargs):
+        self.file_cache = file_cache
+        self.live_reload = live_reload
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.live_reload is not None and self.path.startswith(LIVE_RELOAD_PREFIX):
+            request_path = urlsplit(self.path).path
+            if request_path == LIVE_RELOAD_EVENTS_PATH:
+                self.send_events()
+                return
+            if request_path == LIVE_RELOAD_SCRIPT_PATH:
+                body = LIVE_RELOAD_SCRIPT.encode("utf-8")
+                self.send_response(HTTPStatus.OK)
+                self.send_header("Content-Type", "text/javascript")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+        self.send_file(head_only=False)
+
+    def do_HEAD(self):
+        self.send_file(head_only=True)
+
+    def end_headers(self):
+        self.send_header("Cache-Control", "no-cache")
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+    def send_events(self):
+        """Stream live reload events to the page until it disconnects or the server stops."""
+        client = self.live_reload.subscribe()
+        self.close_connection = True
+        try:
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            self.wfile.write(b"retry: 1000\n\n")
+            while True:
+                try:
+                    message = client.get(timeout=LIVE_RELOAD_PING_INTERVAL)
+                except Empty:
+                    # Comments keep the connection open and detect closed pages
+                    message = b": ping\n\n"
+                if message is None:
+                    break
+                self.wfile.write(message)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.live_reload.unsubscribe(client)
+
+    def resolve_path(self):
+        """
+        Return the file to serve, or None to let the base class redirect to
+        a trailing slash or list a directory without an index file.
+        """
+        path = self.translate_path(self.path)
+        if not os.path.isdir(path):
+            return path
+        if urlsplit(self.path).path.endswith("/"):
+            for index in ("index.html", "index.htm"):
+                index_path = os.path.join(path, index)
+                if os.path.isfile(index_path):
+                    return index_path
+        return None
+
+    def select_encoding(self, path, stat_result):
+        """
+        Pick the precompressed sibling, not older than path, with the highest
+        q-value the client accepts; ties keep PRECOMPRESSED_ENCODINGS order.
+        """
+        qualities = parse_accept_encoding(self.headers.get("Accept-Encoding", ""))
+        candidates = [
+            (qualities.get(encoding, qualities.get("*", 0.0)), encoding, suffix)
+            for encoding, suffix in PRECOMPRESSED_ENCODINGS
+        ]
+        # sorted() is stable, so equal q-values stay in order of preference
+        for quality, encoding, suffix in sorted(candidates, key=lambda candidate: -candidate[0]):
+            if quality <= 0:
+                break
+            try:
+                sibling_stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            if sibling_stat.st_mtime_ns >= stat_result.st_mtime_ns:
+                return encoding, path + suffix, sibling_stat
+        return None, path, stat_result
+
+    def is_not_modified(self, etag, stat_result):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(stat_result.st_mtime) <= since
+        return False
+
+    def parse_range(self, etag, size):
+        """
+        Return the (start, end) byte range requested, None for the whole file
+        or False if the range cannot be satisfied.
+        """
+        range_header = self.headers.get("Range")
+        if range_header is None:
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range.strip() != etag:
+            return None
+        match = _RANGE_PATTERN.match(range_header.strip())
+        if not match or match.groups() == ("", ""):
+            # Multiple or malformed ranges, send the whole file
+            return None
+        first, last = match.groups()
+        if size == 0:
+            # An empty file has no bytes a range could select
+            return False
+        if first == "":
+            length = int(last)
+            if length == 0:
+                return False
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or end < start:
+            return False
+        return start, end
+
+    def send_file(self, head_only):
+        path = self.resolve_path()
+        if path is None:
+            f = self.send_head()
+            if f:
+                try:
+                    if not head_only:
+                        self.copyfile(f, self.wfile)
+                finally:
+                    f.close()
+            return
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+        if not os.path.isfile(path):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+
+        content_type = self.guess_type(path)
+        if self.live_reload is not None and content_type == "text/html":
+            self.send_live_page(path, stat_result, head_only)
+            return
+        compressible = not path.endswith(tuple(suffix for _, suffix in PRECOMPRESSED_ENCODINGS))
+        encoding = None
+        # Ranges refer to the identity representation
+        if compressible and "Range" not in self.headers:
+            encoding, path, stat_result = self.select_encoding(path, stat_result)
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}{"-" + encoding if encoding else ""}"'
+
+        if self.is_not_modified(etag, stat_result):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            if compressible:
+                self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+
+        size = stat_result.st_size
+        byte_range = self.parse_range(etag, size) if encoding is None else None
+        if byte_range is False:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = byte_range if byte_range else (0, size - 1)
+        length = end - start + 1 if size else 0
+        self.send_response(HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Last-Modified", formatdate(stat_result.st_mtime, usegmt=True))
+        self.send_header("ETag", etag)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        else:
+            self.send_header("Accept-Ranges", "bytes")
+        if compressible:
+            self.send_header("Vary", "Accept-Encoding")
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if head_only or length == 0:
+            return
+
+        data = self.file_cache.get(path, stat_result) if self.file_cache is not None else None
+        if data is not None:
+            self.wfile.write(data[start:end + 1])
+            return
+        # Large files go straight from the page cache to the socket where supported
+        with open(path, "rb") as f:
+            try:
+                self.connection.sendfile(f, start, length)
+            except ConnectionError:
+                # The client went away, for example after seeking a video elsewhere
+                self.close_connection = True
+
+    def send_live_page(self, path, stat_result, head_only):
+        """Send an HTML page with the live reload script added before ``</body>``."""
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}-live"'
+        if self.is_not_modified(etag, stat_result):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        data = self.file_cache.get(path, stat_result) if self.file_cache is not None else None
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        script = f'<script src="{LIVE_RELOAD_SCRIPT_PATH}"></script>\n'.encode("utf-8")
+        matches = list(_BODY_END_PATTERN.finditer(data))
+        position = matches[-1].start() if matches else len(data)
+        data = data[:position] + script + data[position:]
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Last-Modified", formatdate(stat_result.st_mtime, usegmt=True))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(data)
+
+
+class StaticServer:
+    """
+    Threaded HTTP server for a directory, running in a background thread.
+
+    If ``port`` is in use, a free port is chosen instead. Pass a
+    ``LiveReload`` to let the served pages follow its events.
+    """
+
+    def __init__(self, directory, host="127.0.0.1", port=8000, handler=StaticRequestHandler, file_cache=None, live_reload=None):
+        self.directory = str(directory)
+        self.file_cache = file_cache if file_cache is not None else FileCache()
+        self.live_reload = live_reload
+        handler = partial(handler, directory=self.directory, file_cache=self.file_cache, live_reload=live_reload)
+        try:
+            self.httpd = ThreadingHTTPServer((host, port), handler)
+        except OSError as e:
+            if e.errno != errno.EADDRINUSE or port == 0:
+                raise
+            logging.warning(f"Port {port} is in use, serving on a free port instead.")
+            self.httpd = ThreadingHTTPServer((host, 0), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        if host in ("0.0.0.0", "::"):
+            host = "127.0.0.1"
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="static-server", daemon=True)
+        self.thread.start()
+        logging.info(f"Serving {self.directory} at {self.url}")
+
+    def stop(self):
+        if self.live_reload is not None:
+            self.live_reload.close()
+        if self.thread is not None:
+            self.httpd.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.httpd.server_close()
@@ -0,0 +1,329 @@
+import os
+import logging
+import threading
+from pathlib import PurePath
+
+from .file_operations import get_theme_path
+
+# Build stages a change can be routed to, run in this order by build.rebuild_stages()
+STYLES = "styles"
+THEME = "theme"
+ASSETS = "assets"
+CUSTOM_CSS = "custom_css"
+CUSTOM_SCRIPTS = "custom_scripts"
+PRESENTATIONS = "presentations"
+
+# File system event types that change build inputs
+WATCHED_EVENT_TYPES = ("created", "deleted", "modified", "moved")
+
+
+class BuildCancelled(Exception):
+    """Raised at a build checkpoint when newer changes made the running build obsolete."""
+
+
+def _is_within(path, directory):
+    """Return True if ``path`` is ``directory`` or inside it (both absolute)."""
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+class ChangeSet:
+    """
+    The build work needed for a batch of changed paths.
+
+    ``stages`` holds whole stages to run again, ``decks`` the deck folders to
+    re-render, ``library_files`` the library paths (relative to the source
+    root) to re-sync and ``removed`` the build output files whose source was
+    deleted. ``full`` requests a full build, for example after ``config.json``
+    changed.
+    """
+
+    def __init__(self):
+        self.full = False
+        self.stages = set()
+        self.decks = set()
+        self.library_files = set()
+        self.removed = set()
+        self.paths = []
+
+    def __bool__(self):
+        return bool(self.full or self.stages or self.decks or self.library_files or self.removed)
+
+    def update(self, other):
+        """Add the work of another change set to this one."""
+        self.full = self.full or other.full
+        self.stages |= other.stages
+        self.decks |= other.decks
+        self.library_files |= other.library_files
+        self.removed |= other.removed
+        self.paths.extend(other.paths)
+
+    def covers(self, other):
+        """Return True if building this change set also does all the work of ``other``."""
+        if self.full:
+            return True
+        return (
+            not other.full
+            and other.stages <= self.stages
+            and other.decks <= self.decks
+            and other.library_files <= self.library_files
+            and other.removed <= self.removed
+        )
+
+    @property
+    def decks_only(self):
+        """True if only the contents of existing decks changed."""
+        return not (self.full or self.stages or self.library_files or self.removed)
+
+    def describe(self):
+        if self.full:
+            return "full build"
+        parts = sorted(self.stages)
+        if self.decks:
+            parts.append(f"decks {', '.join(sorted(self.decks))}")
+        if self.library_files:
+            parts.append(f"{len(self.library_files)} library files")
+        if self.removed:
+            parts.append(f"{len(self.removed)} removed files")
+        return "; ".join(parts)
+
+
+class BuildRouter:
+    """
+    Map changed files of a project to the smallest build work covering them.
+
+    Paths in the configuration are relative to the project root, which must
+    be the working directory, as for the build itself.
+
+    - ``config.json``: full build
+    - a file in a deck folder: re-render that deck
+    - a deck folder created, deleted or renamed, the reveal template or the
+      TOC template: regenerate the presentations (unchanged decks are reused
+      from the build manifest)
+    - a library file: re-sync that file
+    - ``assets/styles``: compile the styles
+    - the theme, its fonts or the highlight.js theme: compile the theme
+    - other assets: copy the assets
+    - ``custom_css`` and ``custom_scripts``: copy them
+
+    Anything else, including ``source/cached`` where the build stages files
+    for Sass, is ignored.
+    """
+
+    def __init__(self, config):
+        # Changes are routed on the watcher thread while builds update the configuration
+        self.lock = threading.RLock()
+        self.update(config)
+
+    def update(self, config):
+        """Recompute the watched locations from a (re)loaded configuration."""
+        with self.lock:
+            self._update(config)
+
+    def _update(self, config):
+        directories = config["directories"]
+        source_root = directories["source"]["root"]
+        self.root = os.path.abspath(".")
+        self.config_file = os.path.join(self.root, "config.json")
+        self.source_root = os.path.abspath(source_root)
+        self.cached_dir = os.path.join(self.source_root, "cached")
+        self.presentation_root = os.path.abspath(os.path.join(source_root, directories["source"]["presentation_root"]))
+        self.libraries_dir = os.path.abspath(os.path.join(source_root, directories["source"]["libraries"]))
+        self.build_dir = os.path.abspath(directories["build"])
+        self.templates = {
+            os.path.abspath(os.path.join(source_root, config[key]))
+            for key in ("reveal_template", "toc_template") if config.get(key)
+        }
+        self.assets_dir = os.path.join(os.path.dirname(self.source_root), "assets")
+        self.styles_dir = os.path.join(self.assets_dir, "styles")
+        self.custom_css_dir = os.path.join(self.root, "custom_css")
+        self.custom_scripts_dir = os.path.join(self.root, "custom_scripts")
+
+        self.theme_file = None
+        self.theme_dir = None
+        try:
+            theme_path = get_theme_path(config)
+        except OSError:
+            theme_path = None
+        if theme_path:
+            self.theme_file = os.path.abspath(theme_path)
+            theme_dir = os.path.dirname(self.theme_file)
+            # Built-in themes only change with the Reveal.js download
+            if not _is_within(theme_dir, self.cached_dir):
+                self.theme_dir = theme_dir
+        highlight_theme = config.get("highlight_theme")
+        self.highlight_theme = None
+        if highlight_theme:
+            highlight_path = highlight_theme if os.path.splitext(highlight_theme)[1] else highlight_theme + ".css"
+            self.highlight_theme = os.path.abspath(highlight_path)
+
+    def watch_directories(self):
+        """Return the (directory, recursive) pairs to watch, without nested or missing ones."""
+        with self.lock:
+            return self._watch_directories()
+
+    def _watch_directories(self):
+        recursive = [self.source_root, self.assets_dir, self.custom_css_dir, self.custom_scripts_dir]
+        if self.theme_dir is not None:
+            # The project root itself is not watched recursively
+            recursive.append(self.theme_dir if self.theme_dir != self.root else os.path.join(self.root, "fonts"))
+        recursive = [path for path in recursive if os.path.isdir(path)]
+        recursive = [
+            path for path in recursive
+            if not any(other != path and _is_within(path, other) for other in recursive)
+        ]
+        directories = [(self.root, False)] + [(path, True) for path in sorted(set(recursive))]
+        return directories
+
+    def add_event(self, changes, event):
+        """Add the build work for a watchdog file system event to ``changes``."""
+        if event.event_type not in WATCHED_EVENT_TYPES:
+            return
+        # A directory is modified whenever an entry in it changes, which has its own event
+        if event.is_directory and event.event_type == "modified":
+            return
+        if event.event_type == "moved":
+            self.add_path(changes, event.src_path, event.is_directory, deleted=True)
+            self.add_path(changes, event.dest_path, event.is_directory)
+        else:
+            self.add_path(changes, event.src_path, event.is_directory, deleted=event.event_type == "deleted")
+
+    def add_path(self, changes, path, is_directory=False, deleted=False):
+        """Add the build work for one created, modified or deleted path to ``changes``."""
+        path = os.path.abspath(os.fsdecode(path))
+        with self.lock:
+            self._add_path(changes, path, is_directory, deleted)
+
+    def _add_path(self, changes, path, is_directory, deleted):
+        if _is_within(path, self.cached_dir) or _is_within(path, self.build_dir):
+            return
+        if not self.route(changes, path, is_directory, deleted):
+            logging.debug(f"Ignoring change to {path}")
+            return
+        changes.paths.append(path)
+
+    def route(self, changes, path, is_directory, deleted):
+        """Add the build work for an absolute path, returning False if no build input changed."""
+        if path == self.config_file:
+            changes.full = True
+            return True
+
+        if _is_within(path, self.presentation_root):
+            relative = os.path.relpath(path, self.presentation_root)
+            if relative == os.curdir:
+                changes.stages.add(PRESENTATIONS)
+                return True
+            parts = relative.split(os.sep)
+            if len(parts) > 1:
+                changes.decks.add(parts[0])
+                return True
+            if not is_directory:
+                return False
+            # The list of decks changed
+            changes.stages.add(PRESENTATIONS)
+            if deleted:
+                changes.removed.add(os.path.join(self.build_dir, f"{parts[0]}.html"))
+            return True
+
+        if path in self.templates:
+            changes.stages.add(PRESENTATIONS)
+            return True
+
+        if _is_within(path, self.libraries_dir):
+            if is_directory:
+                return False
+            relative = os.path.relpath(path, self.source_root)
+            if deleted:
+                changes.removed.add(os.path.join(self.build_dir, relative))
+            else:
+                changes.library_files.add(PurePath(relative).as_posix())
+            return True
+
+        routed = False
+        if path in (self.theme_file, self.highlight_theme) or (
+            self.theme_dir is not None
+            and (
+                _is_within(path, os.path.join(self.theme_dir, "fonts"))
+                or (self.theme_dir != self.root and _is_within(path, self.theme_dir))
+            )
+        ):
+            changes.stages.add(THEME)
+            routed = True
+
+        if _is_within(path, self.styles_dir):
+            changes.stages.add(STYLES)
+        elif _is_within(path, self.assets_dir):
+            changes.stages.add(ASSETS)
+            if deleted and not is_directory:
+                changes.removed.add(os.path.join(self.build_dir, os.path.relpath(path, self.assets_dir)))
+        elif _is_within(path, self.custom_css_dir):
+            changes.stages.add(CUSTOM_CSS)
+        elif _is_within(path, self.custom_scripts_dir):
+            changes.stages.add(CUSTOM_SCRIPTS)
+        else:
+            return routed
+        return True
+
+
+class BuildQueue:
+    """
+    Pending build work shared by the thread collecting changes and the
+    thread running builds.
+
+    Change sets put on the queue are merged into one pending change set, so
+    any number of changes made during a build result in a single follow-up
+    build. When new changes cover all the work of the running build, its
+    result would be stale before it is written, so the build is cancelled:
+    ``check_cancelled()``, called by the build at checkpoints between stages
+    and decks, raises ``BuildCancelled``, and the cancelled work is merged
+    back into the pending change set. Builds always start after the changes
+    they cover were queued, so the last build reflects the last edit.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = None
+        self.running = None
+        self.cancelled = False
+
+    def put(self, changes):
+        """Queue a change set, cancelling the running build if it is superseded."""
+        with self.condition:
+            if self.pending is None:
+                self.pending = ChangeSet()
+            self.pending.update(changes)
+            if self.running is not None and not self.cancelled and changes.covers(self.running):
+                logging.info("Newer changes supersede the running build, cancelling it.")
+                self.cancelled = True
+            self.condition.notify_all()
+
+    def get(self, timeout=None):
+        """
+        Wait for pending work and mark it as running.
+
+        Returns:
+            ChangeSet or None: The work to build, or None if none was queued
+            within ``timeout`` seconds
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.pending is not None, timeout):
+                return None
+            changes, self.pending = self.pending, None
+            self.running = changes
+            self.cancelled = False
+            return changes
+
+    def done(self, cancelled=False):
+        """Mark the running build as finished, queueing its work again if it was cancelled."""
+        with self.condition:
+            if cancelled and self.running is not None:
+                if self.pending is not None:
+                    self.running.update(self.pending)
+                self.pending = self.running
+                self.condition.notify_all()
+            self.running = None
+            self.cancelled = False
+
+    def check_cancelled(self):
+        """Build checkpoint: raise ``BuildCancelled`` if newer changes superseded the running build."""
+        if self.cancelled:
+            raise BuildCancelled()
@@ -3,125 +3,83 @@ import logging
 import sys
 import os
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from functools import partial
 import glob
 import argparse
-import re
-from urllib.parse import unquote
-from html import unescape
 
 # Import utility functions
 from _utils.file_operations import (
     copy_and_overwrite, 
     copy_file_if_different,
     get_theme_path,
+    get_cache_dir,
+    CopyState,
+    ExclusionMatcher,
+    scan_tree,
+    set_copy_state,
+    set_copy_mode,
+    unshare_file,
     cleanup_temp_files,
     parse_delimited_file,
     clean_build_directory
 )
-from _utils.html_operations import beautify_html, compile_scss
+from _utils.html_operations import write_beautified_html, compile_scss, ScssBatch, CssCache, HTML_FORMATTERS
 from _utils.config_operations import read_config, initialize_logging
+from _utils.manifest_operations import BuildManifest, hash_bytes, hash_file
+from _utils.reference_operations import ReferenceGraph
+from _utils.fingerprint_operations import AssetFingerprinter
+from _utils.profile_operations import span, start_profiling, stop_profiling, get_profiler
+from _utils.watch_operations import STYLES, THEME, ASSETS, CUSTOM_CSS, CUSTOM_SCRIPTS, PRESENTATIONS
 from _utils.presentation_operations import (
     parse_slide,
+    SlideCache,
     dict_to_html_attrs,
     validate_titlepage,
 )
 
 
-def get_referenced_files(html_content, libraries_dir, source_root=None, current_path=None):
+def get_referenced_files(html_content, libraries_dir, source_root=None, current_path=None, graph=None):
     """Extract file references from HTML content that are in the libraries directory.
     
     Args:
         html_content (str): The rendered HTML content
         libraries_dir (str): The name of the libraries directory
         source_root (str, optional): The source directory root, needed for recursive HTML scanning
-        current_path (str, optional): Current file path being processed, for relative path resolution
+        current_path (str, optional): Current file path being processed, used as its name in the reference graph
+        graph (ReferenceGraph, optional): Graph shared by the documents of a build, so included
+            library HTML files are only read and scanned once
         
     Returns:
         set: Set of unique file paths referenced in the HTML that are in libraries_dir
     """
-    # First unescape any HTML entities in the content
-    html_content = unescape(html_content)
-    
-    patterns = [
-        # Standard HTML attributes
-        rf'(?:src|data-src|href)\s*=\s*["\']([^"\']*?{libraries_dir}/[^"\']+)["\']',
-        
-        # Background and other data attributes
-        rf'data-background(?:-image)?\s*=\s*["\']([^"\']*?{libraries_dir}/[^"\']+)["\']',
-        
-        # Any other data-* attributes that might reference library files
-        rf'data-[a-zA-Z-]+\s*=\s*["\']([^"\']*?{libraries_dir}/[^"\']+)["\']',
-        
-        # Same attributes but without quotes (rare but possible)
-        rf'(?:src|data-src|href|data-background(?:-image)?)\s*=\s*([^\s>]*?{libraries_dir}/[^\s>]+)',
-        
-        # CSS url() function with optional quotes
-        rf'url\(["\']?([^"\')\s]*?{libraries_dir}/[^"\')\s]+)["\']?\)',
-        
-        # Any quoted path containing libraries_dir (catch-all for other cases)
-        rf'["\']([^"\']*?{libraries_dir}/[^"\']+)["\']'
-    ]
-    
-    referenced_files = set()
-    logging.debug(f"Libraries directory: {libraries_dir}")
-    
-    for pattern in patterns:
-        logging.debug(f"  Searching with pattern: {pattern}")
-        matches = re.finditer(pattern, html_content, re.IGNORECASE)
-        for match in matches:
-            # Always use group 1 as it contains the path without quotes/function calls
-            path = unquote(match.group(1)).replace('\\', '/')
-            
-            # Remove URL fragments (anything after #)
-            path = path.split('#')[0]
-            
-            logging.debug(f"    Found raw path: {path}")
-            
-            # Split the path into components
-            path_parts = re.split(r'[/\\]', path)
-            
-            try:
-                lib_index = path_parts.index(libraries_dir)
-                # Take everything from libraries_dir onwards
-                relative_parts = path_parts[lib_index:]
-                if relative_parts:  # Only process if we have parts after libraries_dir
-                    # Join with OS-specific separator
-                    relative_path = os.path.join(*relative_parts)
-                    logging.debug(f"    Adding relative path: {relative_path}")
-                    referenced_files.add(relative_path)
-                    
-                    # If this is an HTML file and we have a source root, recursively scan it
-                    if source_root and relative_path.endswith('.html'):
-                        html_path = os.path.join(source_root, relative_path)
-                        if os.path.exists(html_path):
-                            logging.debug(f"    Recursively scanning HTML file: {html_path}")
-                            with open(html_path, 'r', encoding='utf-8') as f:
-                                sub_html_content = f.read()
-                            # Recursively scan the HTML content
-                            sub_files = get_referenced_files(
-                                sub_html_content, 
-                                libraries_dir,
-                                source_root=source_root,
-                                current_path=relative_path
-                            )
-                            referenced_files.update(sub_files)
-            except ValueError:
-                logging.debug(f"    Skipping path: {path} (no {libraries_dir} found)")
-            except Exception as e:
-                logging.debug(f"    Error processing path {path}: {str(e)}")
-    
-    if referenced_files:
-        logging.debug("Found referenced files:")
-        for ref in sorted(referenced_files):
-            logging.debug(f"  - {ref}")
-    else:
-        logging.debug("No library references found")
-                
+    if graph is None:
+        graph = ReferenceGraph(libraries_dir, source_root=source_root)
+    name = current_path or "<html>"
+    graph.add_document(name, html_content)
+    referenced_files = graph.closure(name)
+    logging.debug(f"Found {len(referenced_files)} referenced files in {libraries_dir}")
     return referenced_files
 
-def copy_libraries():
-    """Copy all contents of the libraries directory to the build directory."""
+def copy_libraries(referenced=None):
+    """
+    Copy the libraries directory to the build directory.
+
+    Parameters:
+    - referenced (set of str, optional): Library paths, relative to the source
+      root, that the built decks reference. When given, only these files are
+      copied instead of the entire libraries directory.
+    """
+    if referenced is not None:
+        logging.info(f"Copying {len(referenced)} referenced library files...")
+        for relative_path in sorted(referenced):
+            s = os.path.join(config["directories"]["source"]["root"], relative_path)
+            d = os.path.join(config["directories"]["build"], relative_path)
+            if os.path.isfile(s):
+                copy_file_if_different(s, d)
+            else:
+                logging.debug(f"  Could not find referenced library file: {s}")
+        return
+
     logging.info("Copying libraries...")
 
     # Source and destination directories
@@ -157,6 +115,33 @@ def copy_libraries():
             logging.info(f"  Could not find source file: {s}")
 
 
+def sync_library_files(paths):
+    """
+    Copy changed library files to the build directory.
+
+    Parameters:
+    - paths (iterable of str): Posix library paths relative to the source
+      root. With ``library_copy`` set to ``"referenced"``, files the decks do
+      not reference are left out, as in a full build.
+    """
+    for relative_path in sorted(paths):
+        if _referenced_libraries is not None and relative_path not in _referenced_libraries:
+            logging.debug(f"  Skipping unreferenced library file: {relative_path}")
+            continue
+        s = os.path.join(config["directories"]["source"]["root"], relative_path)
+        d = os.path.join(config["directories"]["build"], relative_path)
+        if os.path.isfile(s):
+            copy_file_if_different(s, d)
+
+
+def remove_build_files(paths):
+    """Delete build output files whose source files were deleted."""
+    for path in sorted(paths):
+        if os.path.isfile(path):
+            logging.info(f"Removing {path}")
+            os.remove(path)
+
+
 def copy_custom_scripts():
     """Copy custom scripts, if any, to the desired directory"""
     scripts = config.get("custom_scripts", [])
@@ -165,6 +150,9 @@ def copy_custom_scripts():
         return
     logging.info("Copying custom scripts...")
     source_dir = "custom_scripts"
+    if not os.path.isdir(source_dir):
+        logging.warning(f"Custom scripts are configured but the {source_dir} directory does not exist.")
+        return
     dest_dir = os.path.join(
         config["directories"]["build"], 
         config["directories"]["source"]["libraries"],
@@ -186,6 +174,9 @@ def copy_custom_css():
         return
     logging.info("Copying Custom CSS...")
     source_dir = "custom_css"
+    if not os.path.isdir(source_dir):
+        logging.warning(f"Custom CSS is configured but the {source_dir} directory does not exist.")
+        return
     dest_dir = os.path.join(config["directories"]["build"], "src","css")
     for item in os.listdir(source_dir):
         if item not in css:
@@ -234,7 +225,62 @@ def copy_plugins():
             logging.warning(f"External plugin {plugin} not found in source directory.")
     logging.info("Plugins copied successfully.")
 
-def copy_and_compile_styles():
+def get_css_cache():
+    """Return the compiled CSS cache, or None if disabled by ``build_settings.css_cache``."""
+    if not config.get("build_settings", {}).get("css_cache", True):
+        return None
+    return CssCache(get_cache_dir(config) / "css")
+
+
+def fetch_cached_css(css_cache, entry_file, output_file, staged_dir=None):
+    """
+    Copy previously compiled CSS for ``entry_file`` to ``output_file``.
+
+    Returns:
+    tuple: (hit, cache_key). The key is None when caching is disabled.
+    """
+    if css_cache is None:
+        return False, None
+    cache_key = css_cache.key(entry_file, staged_dir)
+    if css_cache.fetch(cache_key, output_file):
+        logging.info(f"Using cached CSS for '{Path(entry_file).name}'.")
+        return True, cache_key
+    return False, cache_key
+
+
+def queue_scss(input_file, output_file, sass_batch=None, css_cache=None, cache_key=None):
+    """
+    Compile an SCSS file now, or queue it on ``sass_batch`` when one is given.
+
+    When ``cache_key`` is given, the compiled CSS is stored in ``css_cache``.
+    """
+    on_success = None
+    if css_cache is not None and cache_key is not None:
+        on_success = partial(css_cache.store, cache_key, str(output_file))
+    if sass_batch is None:
+        compile_scss(str(input_file), str(output_file))
+        if on_success is not None:
+            on_success()
+    else:
+        sass_batch.add(input_file, output_file, on_success)
+
+
+def after_scss(sass_batch, callback, *args):
+    """Run ``callback`` now, or once ``sass_batch`` has been compiled."""
+    if sass_batch is None:
+        callback(*args)
+    else:
+        sass_batch.after_compile(callback, *args)
+
+
+def remove_staged_styles(files):
+    """Delete style files staged in the Reveal.js theme source for compilation."""
+    for file in files:
+        logging.info(f"Deleting temporary file '{file}'...")
+        file.unlink()
+
+
+def copy_and_compile_styles(sass_batch=None):
     """Copy and compile styles from the assets/styles directory."""
     logging.info("Copying and compiling styles...")
     
@@ -251,29 +297,32 @@ def copy_and_compile_styles():
     # Ensure target directory exists
     target_css.mkdir(parents=True, exist_ok=True)
 
+    css_cache = get_css_cache()
+
     # Copy styles to Reveal.js Theme Source for compilation
     files_to_parse = []
     files_to_copy = list(styles_dir.glob("*.scss")) + list(styles_dir.glob("*.sass")) + list(styles_dir.glob("*.css"))
     for file in files_to_copy:
+        target_path = target_css / file.with_suffix('.css').name
+        # Plain CSS needs no compilation
+        if file.suffix == ".css":
+            copy_file_if_different(str(file), str(target_path))
+            continue
+        # Unchanged stylesheets are copied from the CSS cache without staging
+        cache_hit, cache_key = fetch_cached_css(css_cache, file, target_path, theme_root_in_reveal)
+        if cache_hit:
+            continue
         logging.info(f"Copying {file} to Reveal Theme Source for SASS compilation.")
         reveal_theme_file_path = theme_root_in_reveal / file.name
         copy_file_if_different(str(file), str(reveal_theme_file_path))
         files_to_parse.append(reveal_theme_file_path)
-            
 
-    # Compile SASS/SCSS files
-    for file in files_to_parse:
-        target_path = target_css / file.with_suffix('.css').name
-        if file.suffix != ".css":
-            logging.info(f"Compiling temporary SASS file '{file.stem}'...")
-            compile_scss(str(file), str(target_path))
-        else:
-            copy_file_if_different(str(file), str(target_path))
+        # Compile SASS/SCSS files
+        logging.info(f"Compiling temporary SASS file '{reveal_theme_file_path.stem}'...")
+        queue_scss(reveal_theme_file_path, target_path, sass_batch, css_cache, cache_key)
 
     # Delete the copied files after compilation
-    for file in files_to_parse:
-        logging.info(f"Deleting temporary file '{file}'...")
-        file.unlink()
+    after_scss(sass_batch, remove_staged_styles, files_to_parse)
 
     logging.info("Styles copied and compiled successfully.")
 
@@ -311,53 +360,37 @@ def copy_assets():
     else:
         logging.debug("No additional asset exclusions found in config")
     
-    def should_exclude(path):
-        """Check if a path should be excluded based on exclusion patterns."""
-        path_str = str(path)
-        path_name = path.name  # Get just the filename/directory name
-        
-        for pattern in exclusion_patterns:
-            # For patterns that end with $ (file extensions), check against the full path
-            if pattern.endswith('$'):
-                if re.search(pattern, path_str):
-                    logging.debug(f"Excluding {path_str} (path matches pattern: {pattern})")
-                    return True
-            # For other patterns (directory names, filenames), check against the name only
-            else:
-                if re.search(pattern, path_name):
-                    logging.debug(f"Excluding {path_str} (name matches pattern: {pattern})")
-                    return True
-        return False
-    
-    def copy_assets_recursive(src_path, dest_path):
-        """Recursively copy assets, respecting exclusions."""
-        if should_exclude(src_path):
-            return
-        
-        if src_path.is_file():
-            # Copy file if not excluded
-            dest_path.parent.mkdir(parents=True, exist_ok=True)
-            copy_file_if_different(str(src_path), str(dest_path))
-            logging.debug(f"Copied asset: {src_path} -> {dest_path}")
-        elif src_path.is_dir():
-            # Create destination directory and process contents
-            dest_path.mkdir(parents=True, exist_ok=True)
-            for item in src_path.iterdir():
-                if not should_exclude(item):
-                    copy_assets_recursive(item, dest_path / item.name)
-    
+    matcher = ExclusionMatcher(exclusion_patterns)
+
     # Check if assets directory exists
     if not assets_dir.exists():
         logging.info("No assets directory found, skipping asset copy.")
         return
+    if matcher.matches(assets_dir.name, str(assets_dir)):
+        return
     
-    # Start recursive copy from assets directory to build root
-    copy_assets_recursive(assets_dir, build_root)
+    # Copy from assets directory to build root, without descending into excluded directories
+    build_root.mkdir(parents=True, exist_ok=True)
+    for src_path, relative_path, is_dir in scan_tree(assets_dir, matcher):
+        dest_path = build_root / relative_path
+        if is_dir:
+            dest_path.mkdir(parents=True, exist_ok=True)
+        else:
+            copy_file_if_different(src_path, str(dest_path))
+            logging.debug(f"Copied asset: {src_path} -> {dest_path}")
     
     logging.info("Assets copied successfully.")
 
 
-def compile_theme():
+def remove_staged_theme_files(files_copied):
+    """Delete theme files staged in the Reveal.js theme source for compilation."""
+    logging.info("Removing temporary files from compiling theme.")
+    files_copied = list(set(files_copied))
+    files_copied.sort(reverse=True)
+    cleanup_temp_files(files_copied)
+
+
+def compile_theme(sass_batch=None):
     """Compile the SCSS/SASS theme into CSS."""
     logging.info("Compiling theme...")
 
@@ -390,6 +423,12 @@ def compile_theme():
     fonts_path_in_build = theme_path_in_build.parent / "fonts"
     fonts_path_in_compiler = theme_compiler_root / "fonts"
 
+    # Unchanged themes are copied from the CSS cache without staging
+    css_cache = get_css_cache()
+    cache_hit, cache_key = False, None
+    if not is_theme_precompiled:
+        cache_hit, cache_key = fetch_cached_css(css_cache, theme_path, theme_path_in_build, theme_compiler_root)
+
     # Theme file must exist per get_theme_path()
     logging.info(f"Copying theme '{theme_path.name}'...")
     files_copied = []
@@ -411,24 +450,29 @@ def compile_theme():
         if fonts_path_in_root.exists():
             logging.info(f"\tCopying fonts from '{fonts_path_in_root}' to '{fonts_path_in_build}'...")
             copy_and_overwrite(str(fonts_path_in_root), str(fonts_path_in_build))
-            copy_and_overwrite(
-                str(fonts_path_in_root), 
-                str(fonts_path_in_compiler),
-                files_copied
-                )
+            if not cache_hit:
+                copy_and_overwrite(
+                    str(fonts_path_in_root), 
+                    str(fonts_path_in_compiler),
+                    files_copied
+                    )
             
     else:
         # Not in reveal need more copy logic
         if fonts_path_in_root.exists():
             logging.info(f"\tCopying fonts from '{fonts_path_in_root}' to '{fonts_path_in_build}'...")
             copy_and_overwrite(str(fonts_path_in_root), str(fonts_path_in_build))
-            copy_and_overwrite(
-                str(fonts_path_in_root), 
-                str(fonts_path_in_compiler),
-                files_copied
-                )
+            if not cache_hit:
+                copy_and_overwrite(
+                    str(fonts_path_in_root), 
+                    str(fonts_path_in_compiler),
+                    files_copied
+                    )
+        # Nothing needs staging for compilation on a cache hit
+        if cache_hit:
+            pass
         # if in "." just copy theme file and fonts (if any)
-        if is_theme_in_project_root:
+        elif is_theme_in_project_root:
             logging.info(f"\tUsing theme file {theme_path.name}.")
             copy_file_if_different(
                 str(theme_path),
@@ -468,19 +512,13 @@ def compile_theme():
             str(target_theme_directory/highlight_css_path.name)
             )
     # Compile the target theme
-    if not is_theme_precompiled:
-        compile_scss(
-                str(theme_path_in_compiler),
-                str(theme_path_in_build)
-            )
+    if not is_theme_precompiled and not cache_hit:
+        queue_scss(theme_path_in_compiler, theme_path_in_build, sass_batch, css_cache, cache_key)
     # Cleanup
     if len(files_copied):
-        logging.info("Removing temporary files from compiling theme.")
-        files_copied = list(set(files_copied))
-        files_copied.sort(reverse=True)
-        cleanup_temp_files(files_copied)
+        after_scss(sass_batch, remove_staged_theme_files, files_copied)
 
-def copy_reveal():
+def copy_reveal(sass_batch=None):
     """Copy relevant Reveal.js files to the build directory."""
     logging.info("Copying Reveal.js files...")
 
@@ -508,8 +546,13 @@ def copy_reveal():
     dest_dir = build_root / "src" / "css" / "print"
 
     dest_dir.mkdir(parents=True, exist_ok=True)
-    compile_scss(str(src_dir / "paper.scss"), str(dest_dir / "paper.css"))
-    compile_scss(str(src_dir / "pdf.scss"), str(dest_dir / "pdf.css"))
+    css_cache = get_css_cache()
+    for name in ["paper", "pdf"]:
+        entry_file = src_dir / f"{name}.scss"
+        output_file = dest_dir / f"{name}.css"
+        cache_hit, cache_key = fetch_cached_css(css_cache, entry_file, output_file)
+        if not cache_hit:
+            queue_scss(entry_file, output_file, sass_batch, css_cache, cache_key)
 
     logging.info("Looking for highlight.js theme...")
     highlight_theme = config.get("highlight_theme", "default")
@@ -537,33 +580,311 @@ def copy_reveal():
         logging.info(f"Copying {src_path} to {dest_path}")
         copy_file_if_different(str(src_path), str(dest_path))
 
-def generate_presentation(decks=None):
-    """Generate the final presentation HTML."""
+# Config keys that affect how an individual deck is rendered
+DECK_CONFIG_KEYS = ["directories", "reveal_template", "build_settings"]
+
+
+def get_deck_fingerprint(presentation_path, slide_order, template_digest):
+    """
+    Compute a hash of every input used to render a deck.
+
+    Parameters:
+    - presentation_path (str): The deck folder.
+    - slide_order (list of str): Slide files in render order.
+    - template_digest (str): Hash of the reveal template and the templates it references.
+
+    Returns:
+    str: Hex digest that changes whenever any deck input changes.
+    """
+    parts = [
+        template_digest,
+        json.dumps({key: config.get(key) for key in DECK_CONFIG_KEYS}, sort_keys=True),
+    ]
+    presentation_json_path = os.path.join(presentation_path, "presentation.json")
+    if os.path.exists(presentation_json_path):
+        parts.append(hash_file(presentation_json_path))
+    for slide_file in slide_order:
+        parts.append(slide_file)
+        parts.append(hash_file(os.path.join(presentation_path, slide_file)))
+    return hash_bytes("\n".join(parts))
+
+
+# Jinja2 environments created by this process, keyed by their settings
+_jinja_environments = {}
+
+
+def get_jinja_environment(preserve_code_formatting=True, source_root=".", cache_dir=None, template_dir=None):
+    """
+    Return the shared Jinja2 environment for the deck and TOC templates.
+
+    ``preserve_code_formatting`` turns off ``trim_blocks`` and
+    ``lstrip_blocks``; the TOC always uses the environment with it enabled.
+    One environment is created per process and setting, so compiled templates
+    are reused across decks and rebuilds. Templates are named by their path
+    relative to the project root, with the source root as a fallback search
+    path for includes. When ``cache_dir`` is given, compiled template bytecode
+    is stored there and reused by later builds and worker processes. The
+    environment checks template modification times, so a long-running process
+    picks up template edits between builds. A ``template_dir`` is searched
+    first, so a template loaded by its file name from there can include its
+    siblings.
+    """
+    key = (preserve_code_formatting, source_root, cache_dir, template_dir)
+    if key not in _jinja_environments:
+        from jinja2 import ChoiceLoader, Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
+
+        bytecode_cache = None
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Bytecode depends on the whitespace settings, which are not part of the cache key
+            bytecode_cache = FileSystemBytecodeCache(
+                cache_dir, pattern=f"trim{int(not preserve_code_formatting)}_%s.cache"
+            )
+        loader = FileSystemLoader([".", source_root])
+        if template_dir is not None:
+            loader = ChoiceLoader([FileSystemLoader(template_dir), loader])
+        env = Environment(
+            loader=loader,
+            autoescape=select_autoescape(),
+            bytecode_cache=bytecode_cache,
+            # Only apply whitespace stripping if explicitly disabled by user
+            trim_blocks=not preserve_code_formatting,
+            lstrip_blocks=not preserve_code_formatting,
+        )
+        env.filters["to_html_attrs"] = dict_to_html_attrs
+        _jinja_environments[key] = env
+    return _jinja_environments[key]
+
+
+def get_template_cache_dir():
+    """Return the directory for compiled template bytecode, or None if disabled."""
+    if not config.get("build_settings", {}).get("template_cache", True):
+        return None
+    return str(get_cache_dir(config) / "jinja")
+
+
+def get_deck_template(template_path, preserve_code_formatting=True, source_root=".", cache_dir=None):
+    """Load the reveal template from the shared Jinja2 environment."""
+    env = get_jinja_environment(preserve_code_formatting, source_root, cache_dir)
+    return env.get_template(Path(template_path).as_posix())
+
+
+def get_template_digest(template_path, preserve_code_formatting=True, source_root=".", cache_dir=None):
+    """
+    Hash a template together with every template it extends, includes or imports.
+
+    References are found with ``jinja2.meta.find_referenced_templates`` and
+    resolved through the shared environment, like the deck render does. When
+    a template names another one with an expression, every file in the
+    directory of ``template_path`` is hashed as well.
+    """
+    from jinja2 import TemplateNotFound, meta
+
+    env = get_jinja_environment(preserve_code_formatting, source_root, cache_dir)
+    parts = []
+    seen = set()
+    pending = [Path(template_path).as_posix()]
+    dynamic = False
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        try:
+            source, _, _ = env.loader.get_source(env, name)
+        except TemplateNotFound:
+            # Reported by the render, unless it is only referenced in a branch not taken
+            parts.append(f"{name}:missing")
+            continue
+        parts.append(f"{name}:{hash_bytes(source)}")
+        for reference in meta.find_referenced_templates(env.parse(source)):
+            if reference is None:
+                dynamic = True
+            else:
+                pending.append(reference)
+    if dynamic:
+        template_dir = os.path.dirname(template_path) or "."
+        for entry in sorted(os.scandir(template_dir), key=lambda entry: entry.name):
+            if entry.is_file():
+                parts.append(f"{entry.path}:{hash_file(entry.path)}")
+    return hash_bytes("\n".join(sorted(parts)))
+
+
+def render_deck(job, reference_graph=None):
+    """
+    Parse, render and beautify a single deck and write it to its output path.
+
+    This may run in a worker process, so it only relies on the values passed
+    in ``job`` rather than on the module-level config. Library references are
+    collected in ``reference_graph``, the graph shared by the decks of the
+    build, or in a worker process in the graph created by
+    ``initialize_worker``.
+
+    Parameters:
+    - job (dict): The deck ``folder``, ``path`` and ``output_path``, the
+      partially initialized ``deck`` object, its ``slide_order``, the
+      ``template`` path, the ``preserve_code_formatting``, ``indent`` and
+      ``html_formatter`` build settings, the ``source_root``, the
+      ``template_cache`` directory and ``slide_cache`` file (or None), the deck
+      ``fingerprint`` and, when library references should be collected, the
+      ``libraries_dir``.
+
+    Returns:
+    dict: The deck ``folder``, the ``title`` and ``titlepage`` of the parsed
+    ``deck``, its ``fingerprint``, sorted library ``references`` (or None),
+    ``rendered`` set to True and, when ``profile`` is set and this is a
+    worker process, the ``trace_events`` and ``trace_counters`` recorded
+    while rendering.
+    """
+    if reference_graph is None:
+        reference_graph = _worker_reference_graph
+    if not job["profile"] or get_profiler() is not None:
+        with span(f"deck {job['folder']}", "deck"):
+            return parse_and_render_deck(job, reference_graph)
+
+    start_profiling()
+    try:
+        with span(f"deck {job['folder']}", "deck"):
+            result = parse_and_render_deck(job, reference_graph)
+    finally:
+        profiler = stop_profiling()
+    result['trace_events'] = profiler.events
+    result['trace_counters'] = profiler.counters
+    return result
+
+
+def parse_and_render_deck(job, reference_graph=None):
+    """Parse, render and beautify a single deck, see ``render_deck``."""
+    deck = job["deck"]
+    presentation_path = job["path"]
+    slide_order = job["slide_order"]
+
+    # Clear/initialize deck["slides"] to append the parsed slides
+    deck["slides"] = []
+    slide_cache = None
+    if job["slide_cache"] is not None:
+        slide_cache = load_resident(SlideCache, job["slide_cache"])
+    logging.info(f"Parsing slide files: {json.dumps(slide_order)}")
+    for slide_file in slide_order:
+        slide_path = os.path.join(presentation_path, slide_file)
+        with span(f"parse {slide_file}", "slide"):
+            deck["slides"].append(parse_slide(slide_path, slide_cache))
+    if slide_cache is not None:
+        save_resident(slide_cache)
+    logging.info("Slides parsed successfully.")
+
+    page_title_str = deck["title"]
+    logging.info(f"Parsing titlepage for '{page_title_str}'...")
+    titlepage = deck.get("titlepage")
+    if titlepage:
+        validate_titlepage(titlepage)
+        page_title_str = " ".join(titlepage["headline"]).strip()
+        deck["titlepage"] = titlepage
+    
+    deck["title"] = str(page_title_str)    
+    
+    logging.info(f"Finished parsing '{str(page_title_str)}'.")
+
+    # Render, beautify and write the HTML, streaming it with the fast formatter
+    with span("render", "deck"):
+        template = get_deck_template(
+            job["template"], job["preserve_code_formatting"], job["source_root"], job["template_cache"]
+        )
+        write_beautified_html(
+            template.generate(deck=deck), job["output_path"], job["indent"], formatter=job["html_formatter"]
+        )
+
+    references = None
+    if job["libraries_dir"] is not None:
+        with span("references", "deck"):
+            with open(job["output_path"], "r", encoding="utf-8") as f:
+                html = f.read()
+            references = sorted(get_referenced_files(
+                html, job["libraries_dir"], source_root=job["source_root"],
+                current_path=job["output_path"], graph=reference_graph,
+            ))
+
+    # Only the TOC metadata is returned, the parsed slides are dropped with the deck
+    return {
+        'folder': job["folder"],
+        'deck': {"title": deck["title"], "titlepage": deck.get("titlepage")},
+        'fingerprint': job["fingerprint"],
+        'references': references,
+        'rendered': True,
+    }
+
+
+def initialize_worker(log_level, libraries_dir=None, source_root=None):
+    """
+    Configure logging in a deck render worker process and create the
+    reference graph shared by the decks it renders.
+    """
+    global _worker_reference_graph
+    initialize_logging({}, log_level)
+    if libraries_dir is not None:
+        _worker_reference_graph = ReferenceGraph(libraries_dir, source_root=source_root)
+
+
+def get_worker_count(jobs=None):
+    """
+    Resolve the number of deck render workers.
+
+    The ``--jobs`` option takes precedence over ``build_settings.workers``.
+    A value of ``0`` or ``"auto"`` uses every available CPU core.
+    """
+    workers = jobs if jobs is not None else config.get("build_settings", {}).get("workers", 1)
+    if workers in (0, "0", "auto"):
+        return os.cpu_count() or 1
+    try:
+        return max(1, int(workers))
+    except (TypeError, ValueError):
+        logging.warning(f"Invalid worker count '{workers}', rendering decks serially.")
+        return 1
+
+
+def generate_presentation(decks=None, jobs=None, changed=None):
+    """
+    Generate the final presentation HTML.
+
+    ``changed`` names the decks whose inputs are known to have changed, for
+    rebuilds triggered by file system events. Other decks that were built
+    before are then reused without reading their inputs, the libraries
+    directory is not copied again (only library files newly referenced by
+    the changed decks are) and the table of contents is only regenerated if
+    a deck title or title page changed.
+    """
+    global _referenced_libraries, _toc_entries
     logging.info("Generating presentations...")
 
     # Initialize an empty array to collect presentation data for TOC
     presentations_for_toc = []
     rendered_presentations = []
+    render_jobs = []
+
+    # Load the manifest of previously built decks for incremental builds
+    incremental = config.get("build_settings", {}).get("incremental", True)
+    manifest = None
+    if incremental:
+        manifest = load_resident(BuildManifest, get_cache_dir(config) / "build_manifest.json")
 
-    # Create a Jinja2 environment and add the custom filter
     # Check if we should preserve code formatting (default to True for better UX)
     preserve_code_formatting = config.get("build_settings", {}).get("preserve_code_formatting", True)
-    
-    env = Environment(
-        loader=FileSystemLoader("."),
-        autoescape=select_autoescape(),
-        # Only apply whitespace stripping if explicitly disabled by user
-        trim_blocks=not preserve_code_formatting,
-        lstrip_blocks=not preserve_code_formatting,
-    )
-    env.filters["to_html_attrs"] = dict_to_html_attrs
+    beautify_indent = config.get("build_settings", {}).get("html_indent_size", 2)
+    html_formatter = config.get("build_settings", {}).get("html_formatter", "bs4")
+    if html_formatter not in HTML_FORMATTERS:
+        logging.error(f"Unknown html_formatter '{html_formatter}', expected one of: {', '.join(HTML_FORMATTERS)}")
+        sys.exit(1)
+
+    template_cache = get_template_cache_dir()
+    cache_slides = config.get("build_settings", {}).get("slide_cache", True)
 
     # Load the reveal template
     pres_template_path = os.path.join(
         config["directories"]["source"]["root"], config["reveal_template"]
     ).replace("\\", "/")
-    # Load your template
-    template = env.get_template(pres_template_path)
+    template_digest = get_template_digest(
+        pres_template_path, preserve_code_formatting, config["directories"]["source"]["root"], template_cache
+    )
 
     presentation_root = os.path.join(
         config["directories"]["source"]["root"],
@@ -572,9 +893,19 @@ def generate_presentation(decks=None):
 
     # Get libraries directory name for reference checking
     libraries_dir = config["directories"]["source"]["libraries"]
-
-    # First pass: render all presentations and collect file references
-    for presentation_folder in os.listdir(presentation_root):
+    copy_referenced_only = config.get("build_settings", {}).get("library_copy", "all") == "referenced"
+    # Shared by the decks rendered in this process and the TOC, so library
+    # HTML included by several decks is only scanned once per build
+    reference_graph = None
+    if copy_referenced_only:
+        reference_graph = ReferenceGraph(libraries_dir, source_root=config["directories"]["source"]["root"])
+
+    presentation_folders = os.listdir(presentation_root)
+    if manifest is not None and not decks:
+        manifest.prune(presentation_folders)
+
+    # First pass: collect the decks to render, in deck order
+    for presentation_folder in presentation_folders:
         if decks and presentation_folder not in decks:
             continue
 
@@ -584,6 +915,23 @@ def generate_presentation(decks=None):
         if not os.path.isdir(presentation_path):
             continue
 
+        # Reuse decks that the triggering changes did not touch
+        if changed is not None and presentation_folder not in changed and manifest is not None:
+            cached_deck = manifest.get_deck(presentation_folder)
+            output_path = os.path.join(config["directories"]["build"], f"{presentation_folder}.html")
+            if (
+                cached_deck
+                and os.path.exists(output_path)
+                and (not copy_referenced_only or cached_deck.get("references") is not None)
+            ):
+                rendered_presentations.append({
+                    'folder': presentation_folder,
+                    'deck': cached_deck["toc"],
+                    'fingerprint': cached_deck["fingerprint"],
+                    'references': cached_deck.get("references"),
+                })
+                continue
+
         # Initialize deck object
         deck = {
             "title": presentation_folder,
@@ -618,63 +966,146 @@ def generate_presentation(decks=None):
                 if os.path.exists(os.path.join(presentation_path, slide))
             ]
 
-        # Clear/initialize deck["slides"] to append the parsed slides
-        deck["slides"] = []
-        logging.info(f"Parsing slide files: {json.dumps(slide_order)}")
-        for slide_file in slide_order:
-            slide_path = os.path.join(presentation_path, slide_file)
-            deck["slides"].append(parse_slide(slide_path))
-        logging.info("Slides parsed successfully.")
-
-        page_title_str = deck["title"]
-        logging.info(f"Parsing titlepage for '{page_title_str}'...")
-        titlepage = deck.get("titlepage")
-        if titlepage:
-            validate_titlepage(titlepage)
-            page_title_str = " ".join(titlepage["headline"]).strip()
-            deck["titlepage"] = titlepage
-        
-        deck["title"] = str(page_title_str)    
-        
-        logging.info(f"Finished parsing '{str(page_title_str)}'.")
-
-        # Render the HTML
-        rendered_html = template.render(deck=deck)
-        
-        # Store rendered HTML for later
-        rendered_presentations.append({
-            'folder': presentation_folder,
-            'html': rendered_html,
-            'deck': deck
-        })
-
-    # Copy all library files
-    copy_libraries()
-
-    # Second pass: write out all presentations
-    for presentation in rendered_presentations:
-        pres_link = f"{presentation['folder']}.html"
-        output_path = os.path.join(config["directories"]["build"], pres_link)
-        
-        with open(output_path, "w", encoding="utf-8") as f:
-            # Apply HTML beautification with code formatting preservation
-            beautify_indent = config.get("build_settings", {}).get("html_indent_size", 2)
-            f.write(beautify_html(presentation['html'], beautify_indent))
-
-        # Add to TOC data
-        presentations_for_toc.append({
-            "id": pres_link,
-            "name": presentation['deck']["title"],
-            "titlepage": presentation['deck'].get("titlepage", ""),
+        # Skip decks whose inputs are unchanged since the last build
+        fingerprint = None
+        if manifest is not None:
+            fingerprint = get_deck_fingerprint(presentation_path, slide_order, template_digest)
+            cached_deck = manifest.get_deck(presentation_folder)
+            output_path = os.path.join(config["directories"]["build"], f"{presentation_folder}.html")
+            if (
+                cached_deck
+                and cached_deck.get("fingerprint") == fingerprint
+                and os.path.exists(output_path)
+                and (not copy_referenced_only or cached_deck.get("references") is not None)
+            ):
+                logging.info(f"Skipping '{presentation_folder}', inputs unchanged since last build.")
+                rendered_presentations.append({
+                    'folder': presentation_folder,
+                    'deck': cached_deck["toc"],
+                    'fingerprint': fingerprint,
+                    'references': cached_deck.get("references"),
+                })
+                continue
+
+        # Reserve the deck's position so output order matches a serial build
+        rendered_presentations.append(None)
+        render_jobs.append({
+            "folder": presentation_folder,
+            "path": presentation_path,
+            "output_path": os.path.join(config["directories"]["build"], f"{presentation_folder}.html"),
+            "deck": deck,
+            "slide_order": slide_order,
+            "template": pres_template_path,
+            "preserve_code_formatting": preserve_code_formatting,
+            "indent": beautify_indent,
+            "html_formatter": html_formatter,
+            "fingerprint": fingerprint,
+            "libraries_dir": libraries_dir if copy_referenced_only else None,
+            "source_root": config["directories"]["source"]["root"],
+            "template_cache": template_cache,
+            "slide_cache": (
+                str(get_cache_dir(config) / "slides" / f"{presentation_folder}.json") if cache_slides else None
+            ),
+            "profile": get_profiler() is not None,
         })
 
-    # Generate the TOC
-    generate_toc(
-        presentations_for_toc,
-        os.path.join(config["directories"]["source"]["root"], config["toc_template"]),
-        config["directories"]["build"],
-        config["info"].get("project_title", "Table of Contents")
-    )
+    # Parse, render and write decks, across worker processes if requested.
+    # Results are consumed as they arrive and only keep TOC metadata and
+    # references, so memory is bounded by the largest single deck.
+    workers = min(get_worker_count(jobs), len(render_jobs))
+    executor = None
+    if workers > 1:
+        logging.info(f"Rendering {len(render_jobs)} decks with {workers} workers...")
+        log_level = logging.getLevelName(logging.getLogger().getEffectiveLevel())
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Workers are spawned rather than forked: serve and the daemon build
+        # in a process running other threads, whose held locks a forked
+        # worker would inherit
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initialize_worker,
+            initargs=(log_level, libraries_dir if copy_referenced_only else None, config["directories"]["source"]["root"]),
+        )
+        rendered = executor.map(render_deck, render_jobs)
+    else:
+        rendered = (render_deck(job, reference_graph) for job in render_jobs)
+
+    profiler = get_profiler()
+    referenced = set()
+    try:
+        # Fill the reserved positions in deck order
+        for presentation in rendered_presentations:
+            checkpoint()
+            if presentation is None:
+                presentation = next(rendered)
+                # Merge the trace events and counters recorded in worker processes
+                trace_events = presentation.pop('trace_events', None)
+                trace_counters = presentation.pop('trace_counters', None)
+                if (trace_events or trace_counters) and profiler is not None:
+                    profiler.merge(trace_events or [], trace_counters)
+
+            if presentation.get('rendered') and manifest is not None:
+                manifest.set_deck(presentation['folder'], {
+                    "fingerprint": presentation['fingerprint'],
+                    "toc": presentation['deck'],
+                    "references": presentation['references'],
+                })
+            if copy_referenced_only:
+                referenced.update(presentation['references'])
+
+            # Add to TOC data
+            presentations_for_toc.append({
+                "id": f"{presentation['folder']}.html",
+                "name": presentation['deck']["title"],
+                "titlepage": presentation['deck'].get("titlepage", ""),
+            })
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    if manifest is not None:
+        save_resident(manifest)
+
+    # Copy library files, limited to those the decks reference if requested.
+    # Editing decks leaves the libraries directory unchanged, changes to it
+    # are re-synced file by file.
+    previous_referenced = _referenced_libraries
+    _referenced_libraries = referenced if copy_referenced_only else None
+    if copy_referenced_only:
+        toc_template_path = os.path.join(config["directories"]["source"]["root"], config["toc_template"])
+        with open(toc_template_path, "r", encoding="utf-8") as f:
+            referenced.update(get_referenced_files(
+                f.read(), libraries_dir, source_root=config["directories"]["source"]["root"],
+                current_path=toc_template_path, graph=reference_graph,
+            ))
+        if changed is not None and previous_referenced is not None:
+            added = referenced - previous_referenced
+            if added:
+                with span("copy_libraries", "stage"):
+                    copy_libraries(added)
+        else:
+            with span("copy_libraries", "stage"):
+                copy_libraries(referenced)
+    elif changed is None:
+        with span("copy_libraries", "stage"):
+            copy_libraries()
+
+    # Generate the TOC, unless only deck contents changed
+    toc_path = os.path.join(config["directories"]["build"], "index.html")
+    if changed is None or presentations_for_toc != _toc_entries or not os.path.exists(toc_path):
+        with span("generate_toc", "stage"):
+            generate_toc(
+                presentations_for_toc,
+                os.path.join(config["directories"]["source"]["root"], config["toc_template"]),
+                config["directories"]["build"],
+                config["info"].get("project_title", "Table of Contents")
+            )
+        _toc_entries = presentations_for_toc
+    else:
+        logging.info("Deck titles unchanged, keeping the table of contents.")
 
 
 def generate_toc(presentations, template, target, project_title):
@@ -690,13 +1121,15 @@ def generate_toc(presentations, template, target, project_title):
     None
     """
     logging.info("Preparing TOC...")
-    # Set up the Jinja2 environment
-    env = Environment(
-        loader=FileSystemLoader(os.path.dirname(template)),
-        autoescape=select_autoescape(["html", "xml"]),
+    # preserve_code_formatting only applies to decks, the TOC always renders
+    # with Jinja's default whitespace handling. Its directory is searched
+    # first, so includes of files next to it resolve as they always did.
+    env = get_jinja_environment(
+        preserve_code_formatting=True,
+        source_root=config["directories"]["source"]["root"],
+        cache_dir=get_template_cache_dir(),
+        template_dir=os.path.dirname(os.path.abspath(template)),
     )
-
-    # Load the template
     toc_template = env.get_template(os.path.basename(template))
     # Prepare the data for the template
     toc_links = [
@@ -715,11 +1148,23 @@ def generate_toc(presentations, template, target, project_title):
 
     # Save the rendered HTML to the target directory
     target_path = os.path.join(target, "index.html")
+    unshare_file(target_path)
     with open(target_path, "w", encoding="utf-8") as f:
         f.write(rendered_toc)
 
     logging.info(f"Generated TOC and saved at {target_path}")
 
+def fingerprint_assets():
+    """
+    Publish content-hashed copies of the assets referenced by the decks and
+    the table of contents, and rewrite their references to use them.
+    """
+    build_dir = config["directories"]["build"]
+    html_files = sorted(glob.glob(os.path.join(build_dir, "*.html")))
+    fingerprinter = AssetFingerprinter(build_dir, get_cache_dir(config) / "asset_hashes.json")
+    fingerprinter.run(html_files)
+
+
 def get_build_decks(config, decks=None):
     if not decks:
         return None
@@ -752,15 +1197,152 @@ def get_build_decks(config, decks=None):
 
     return valid_decks
 
-if __name__ == "__main__":
+
+# Build state kept in memory between builds of a long-running process, keyed
+# by file path. None unless enabled by keep_resident_state().
+_resident_state = None
+
+# Library files referenced by the last generated presentations, or None if
+# the whole libraries directory is copied
+_referenced_libraries = None
+
+# Reference graph of a deck render worker process, see initialize_worker()
+_worker_reference_graph = None
+
+# TOC entries of the last generated table of contents, or None
+_toc_entries = None
+
+# Called at build checkpoints, raising to cancel the build. None unless set
+# by set_cancel_check().
+_cancel_check = None
+
+
+def set_cancel_check(check):
+    """
+    Set a function that is called between build stages and decks and raises
+    an exception to cancel the build, or None to disable cancellation.
+    """
+    global _cancel_check
+    _cancel_check = check
+
+
+def checkpoint():
+    """Give a cancellable build the chance to stop before its next step."""
+    if _cancel_check is not None:
+        _cancel_check()
+
+
+def keep_resident_state():
+    """
+    Keep the build manifest, copy state and parsed-slide caches in memory
+    between builds of this process instead of reloading them from disk.
+    """
+    global _resident_state
+    if _resident_state is None:
+        _resident_state = {}
+
+
+def _file_key(path):
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return (stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino)
+
+
+def load_resident(cls, path):
+    """
+    Return ``cls(path)``, reusing the instance kept from a previous build of
+    this process while its file on disk is unchanged.
+    """
+    path = str(path)
+    if _resident_state is None:
+        return cls(path)
+    entry = _resident_state.get(path)
+    if entry is not None and entry[1] == _file_key(path):
+        return entry[0]
+    instance = cls(path)
+    _resident_state[path] = (instance, _file_key(path))
+    return instance
+
+
+def save_resident(instance, **kwargs):
+    """Save an instance returned by ``load_resident`` and remember its file state."""
+    instance.save(**kwargs)
+    if _resident_state is not None:
+        _resident_state[instance.path] = (instance, _file_key(instance.path))
+
+
+def rebuild_stages(changes, persistent_sass=True):
+    """
+    Run only the build stages covering a ``ChangeSet`` of changed inputs, in
+    a project built earlier in this process.
+
+    Styles and the theme are compiled in one Sass batch, assets, custom CSS
+    and custom scripts are copied again, outputs of deleted files are
+    removed, and only the changed decks are re-rendered (all decks are
+    checked against the build manifest when the deck list or templates
+    changed). Changed library files are re-synced individually. Uses the
+    configuration of the last ``main()`` call, including its deck selection
+    and worker count.
+    """
+    logging.info(f"Rebuilding: {changes.describe()}")
+    copy_state = load_resident(CopyState, get_cache_dir(config) / "copy_state.json")
+    set_copy_state(copy_state)
+    try:
+        if changes.stages & {STYLES, THEME}:
+            sass_batch = ScssBatch(persistent=persistent_sass)
+            if STYLES in changes.stages:
+                copy_and_compile_styles(sass_batch)
+            if THEME in changes.stages:
+                compile_theme(sass_batch)
+            sass_batch.compile()
+        checkpoint()
+        if ASSETS in changes.stages:
+            copy_assets()
+        if CUSTOM_CSS in changes.stages:
+            copy_custom_css()
+        if CUSTOM_SCRIPTS in changes.stages:
+            copy_custom_scripts()
+        remove_build_files(changes.removed)
+        checkpoint()
+        if PRESENTATIONS in changes.stages or changes.decks:
+            generate_presentation(
+                decks=get_build_decks(config, args.decks),
+                jobs=args.jobs,
+                changed=None if PRESENTATIONS in changes.stages else set(changes.decks),
+            )
+        if changes.library_files:
+            sync_library_files(changes.library_files)
+        checkpoint()
+        if config.get("build_settings", {}).get("fingerprint_assets", False):
+            fingerprint_assets()
+    finally:
+        set_copy_state(None)
+        # Entries of the files this rebuild did not copy are still valid
+        save_resident(copy_state, prune=False)
+
+
+def main(argv=None, persistent_sass=False, project_config=None):
+    """
+    Run a build from command-line arguments.
+
+    ``persistent_sass`` compiles SCSS with the shared embedded Sass process,
+    which stays running so later builds in the same process (such as those
+    triggered by ``revealpack serve``) skip Dart Sass startup.
+    ``project_config`` is used instead of reading ``config.json`` when given.
+    """
+    global args, config
     parser = argparse.ArgumentParser(description='Setup Reveal.js presentation environment.')
     parser.add_argument('--root', type=str, default=os.getcwd(), help='Target directory for setup')
     parser.add_argument('--clean', action='store_true', help='Perform a clean build')
     parser.add_argument('--decks', type=str, default=None, help='Comma-separated list of decks or a path to a file with deck names')
     parser.add_argument('--log-level', type=str, default='INFO', help='Set the logging level')
-    args = parser.parse_args()
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Number of worker processes for deck rendering (0 uses all cores)')
+    parser.add_argument('--profile', type=str, nargs='?', const='revealpack-profile.json', default=None, help='Write a Chrome trace of the build to this file (default: revealpack-profile.json)')
+    args = parser.parse_args(argv)
 
-    config = read_config(args.root)
+    config = project_config if project_config is not None else read_config(args.root)
     
     # Initialize jogger for tracking errors/success
     initialize_logging(config, args.log_level)
@@ -776,26 +1358,78 @@ if __name__ == "__main__":
     # Determine decks to build
     decks_to_build = get_build_decks(config,args.decks)
     
-    # Initialize Jinja2 environment
-    env = Environment(loader=FileSystemLoader("."))
+    # Select how files are copied into the build directory
+    try:
+        set_copy_mode(config.get("build_settings", {}).get("copy_mode", "copy"))
+    except ValueError as e:
+        logging.error(str(e))
+        sys.exit(1)
 
-    # Step 1: Copy libraries
-    # copy_libraries()
+    # Detect unchanged files from their recorded stat data instead of their contents
+    copy_state = load_resident(CopyState, get_cache_dir(config) / "copy_state.json")
+    set_copy_state(copy_state)
 
-    # Step 2: Copy plugins
-    copy_plugins()
+    if args.profile:
+        start_profiling()
 
-    # Step 3: Compile styles
-    copy_and_compile_styles()
-    
-    # Step 4: Copy assets
-    copy_assets()
-    
-    # Step 5: Compile theme
-    compile_theme()
+    completed = False
+    try:
+        # Step 1: Copy libraries
+        # copy_libraries()
+
+        # Step 2: Copy plugins
+        with span("copy_plugins", "stage"):
+            copy_plugins()
+
+        # Collect every SCSS compilation so Dart Sass only starts once. The
+        # batch cleans up staged files when compiled, so there are no
+        # checkpoints until then.
+        checkpoint()
+        sass_batch = ScssBatch(persistent=persistent_sass)
 
-    # Step 6: Copy over Reveal.js files
-    copy_reveal()
+        # Step 3: Compile styles
+        with span("copy_and_compile_styles", "stage"):
+            copy_and_compile_styles(sass_batch)
+        
+        # Step 4: Copy assets
+        with span("copy_assets", "stage"):
+            copy_assets()
+        
+        # Copy the custom CSS and scripts listed in the configuration
+        with span("copy_custom_files", "stage"):
+            copy_custom_css()
+            copy_custom_scripts()
+
+        # Step 5: Compile theme
+        with span("compile_theme", "stage"):
+            compile_theme(sass_batch)
+
+        # Step 6: Copy over Reveal.js files
+        with span("copy_reveal", "stage"):
+            copy_reveal(sass_batch)
+
+        # Run the queued SCSS compilations in a single Dart Sass process
+        with span("compile_scss", "stage"):
+            sass_batch.compile()
+
+        # Step 7: Generate presentation
+        checkpoint()
+        with span("generate_presentation", "stage"):
+            generate_presentation(decks=decks_to_build, jobs=args.jobs)
+
+        # Step 8: Fingerprint referenced asset filenames
+        checkpoint()
+        if config.get("build_settings", {}).get("fingerprint_assets", False):
+            with span("fingerprint_assets", "stage"):
+                fingerprint_assets()
+        completed = True
+    finally:
+        set_copy_state(None)
+        # Entries of files an interrupted build did not reach are still valid
+        save_resident(copy_state, prune=completed)
+        profiler = stop_profiling()
+        if profiler is not None:
+            profiler.save(args.profile)
 
-    # Step 7: Generate presentation
-    generate_presentation(decks=decks_to_build)
+if __name__ == "__main__":
+    main()
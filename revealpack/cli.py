@@ -1,13 +1,33 @@
 import click
 import os
-import subprocess
 import sys
-import webbrowser
-import http.server
-import socketserver
+import importlib
 from revealpack import copy_config_and_assets
 from ._version import get_version, get_description
 
+
+def run_script(name, argv):
+    """
+    Run the ``main`` function of a command script (build, serve, setup,
+    package or daemon) in this process.
+
+    The scripts import their utilities as top-level ``_utils`` modules, so the
+    package directory is put first on ``sys.path`` while the script runs and
+    removed again afterwards. Importing on demand also keeps each command's
+    dependencies out of the startup of the others.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, script_dir)
+    try:
+        module = importlib.import_module(name)
+        module.main(argv)
+    except SystemExit as e:
+        if e.code:
+            print(f"An error occurred during {name}: exit code {e.code}")
+            raise
+    finally:
+        sys.path.remove(script_dir)
+
 @click.group()
 @click.version_option(
     version=get_version(),
@@ -32,12 +52,7 @@ def init(destination):
 @click.option('-r', '--root', default=os.getcwd(), help='Root directory for setup')
 def setup(args, root):
     """Setup the environment for building presentations."""
-    setup_script = os.path.join(os.path.dirname(__file__), 'setup.py')
-    python_executable = sys.executable
-    try:
-        subprocess.run([python_executable, setup_script, '--root', root] + list(args), check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"An error occurred during setup: {e}")
+    run_script('setup', ['--root', root] + list(args))
 
 @cli.command()
 @click.argument('args', nargs=-1)
@@ -45,11 +60,10 @@ def setup(args, root):
 @click.option('-c', '--clean', is_flag=True, help='Perform a clean build')
 @click.option('-d', '--decks', type=click.Path(exists=True, dir_okay=False, readable=True), help='Specify decks to build (comma-separated values or a file path)')
 @click.option('-l', '--log-level', type=click.Choice(['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']), default='INFO', help='Set the logging level')
-def build(args, root, clean, decks, log_level):
+@click.option('-j', '--jobs', type=int, default=None, help='Number of worker processes for deck rendering (0 uses all cores)')
+@click.option('--profile', is_flag=False, flag_value='revealpack-profile.json', default=None, help='Write a Chrome trace of the build to this file (default: revealpack-profile.json)')
+def build(args, root, clean, decks, log_level, jobs, profile):
     """Build the presentation package."""
-
-    build_script = os.path.join(os.path.dirname(__file__), 'build.py')
-    python_executable = sys.executable
     build_args = ['--root', root] + list(args)
 
     # Handle clean build
@@ -66,10 +80,15 @@ def build(args, root, clean, decks, log_level):
         build_args.append('--log-level')
         build_args.append(log_level)
 
-    try:
-        subprocess.run([python_executable, build_script] + build_args, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"An error occurred during build: {e}")
+    # Handle parallel deck rendering
+    if jobs is not None:
+        build_args.extend(['--jobs', str(jobs)])
+
+    # Handle build profiling
+    if profile:
+        build_args.extend(['--profile', profile])
+
+    run_script('build', build_args)
 
 @cli.command()
 @click.argument('args', nargs=-1)
@@ -77,22 +96,24 @@ def build(args, root, clean, decks, log_level):
 @click.option('-n', '--no-build', is_flag=True, help='Skip build and only run the server')
 @click.option('-c', '--clean', is_flag=True, help='Perform a clean build before serving')
 @click.option('-d', '--decks', type=str, help='Specify decks to build (comma-separated values or a file path)')
-def serve(args, root, no_build, clean, decks):
+@click.option('--host', default='127.0.0.1', help='Address to serve on (use 0.0.0.0 to share on the network)')
+@click.option('-p', '--port', type=int, default=8000, help='Port to serve on (a free port is used if it is taken)')
+@click.option('--no-browser', is_flag=True, help='Do not open the presentations in a browser')
+@click.option('--no-live-reload', is_flag=True, help='Do not update open presentations after a rebuild')
+def serve(args, root, no_build, clean, decks, host, port, no_browser, no_live_reload):
     """Serve the presentation for live editing."""
-    serve_script = os.path.join(os.path.dirname(__file__), 'serve.py')
-    python_executable = sys.executable
-    try:
-        cmd = [python_executable, serve_script, '--root', root]
-        if no_build:
-            cmd.append('--no-build')
-        if clean:
-            cmd.append('--clean')
-        if decks:
-            cmd.extend(['--decks', decks])
-        cmd += list(args)
-        subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"An error occurred during serve: {e}")
+    serve_args = ['--root', root, '--host', host, '--port', str(port)]
+    if no_build:
+        serve_args.append('--no-build')
+    if clean:
+        serve_args.append('--clean')
+    if decks:
+        serve_args.extend(['--decks', decks])
+    if no_browser:
+        serve_args.append('--no-browser')
+    if no_live_reload:
+        serve_args.append('--no-live-reload')
+    run_script('serve', serve_args + list(args))
 
 
 @cli.command()
@@ -104,31 +125,54 @@ def serve(args, root, no_build, clean, decks):
 @click.option('-d','--decks', type=click.Path(exists=True, dir_okay=False, readable=True), help='Specify decks to build (comma-separated values or a file path)')
 def package(args, root, target_dir, no_build, clean, decks):
     """Package the presentation into a distributable format."""
-    package_script = os.path.join(os.path.dirname(__file__), 'package.py')
-    python_executable = sys.executable
-    try:
-        cmd = [python_executable, package_script, '--root', root]
-        
-        if target_dir is not None:
-            cmd.extend(['--target-dir', target_dir])
-        
-        if no_build:
-            cmd.append('--no-build')
-        
-        if clean or decks:
-            cmd.append('--clean')
-        
-        if decks:
-            cmd.extend(['--decks', decks])
-        
-        subprocess.run(cmd + list(args), check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"An error occurred during packaging: {e}")
+    package_args = ['--root', root]
+    
+    if target_dir is not None:
+        package_args.extend(['--target-dir', target_dir])
+    
+    if no_build:
+        package_args.append('--no-build')
+    
+    if clean or decks:
+        package_args.append('--clean')
+    
+    if decks:
+        package_args.extend(['--decks', decks])
+    
+    run_script('package', package_args + list(args))
+
+
+@cli.command()
+@click.argument('command', type=click.Choice(['start', 'build', 'status', 'stop']), default='start')
+@click.option('-r', '--root', default=os.getcwd(), help='Root directory of the project')
+@click.option('-p', '--port', type=int, default=None, help='Port to listen on when starting (default: any free port)')
+@click.option('-c', '--clean', is_flag=True, help='Perform a clean build (build command)')
+@click.option('-d', '--decks', type=str, help='Specify decks to build (comma-separated values or a file path)')
+@click.option('-j', '--jobs', type=int, default=None, help='Number of worker processes for deck rendering (0 uses all cores)')
+@click.option('-l', '--log-level', type=click.Choice(['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']), default=None, help='Set the logging level')
+def daemon(command, root, port, clean, decks, jobs, log_level):
+    """Run a long-lived build daemon, or send it a build, status or stop request."""
+    daemon_args = [command, '--root', root]
+    if port is not None:
+        daemon_args.extend(['--port', str(port)])
+    if clean:
+        daemon_args.append('--clean')
+    if decks:
+        daemon_args.extend(['--decks', decks])
+    if jobs is not None:
+        daemon_args.extend(['--jobs', str(jobs)])
+    if log_level:
+        daemon_args.extend(['--log-level', log_level])
+    run_script('daemon', daemon_args)
 
 
 @cli.command()
 def docs():
     """Display the documentation for revealpack."""
+    import webbrowser
+    import http.server
+    import socketserver
+
     doc_dir = os.path.join(os.path.dirname(__file__), 'site')
 
     if os.path.exists(doc_dir):
@@ -0,0 +1,245 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import logging
+import secrets
+import argparse
+import threading
+import traceback
+import socketserver
+from pathlib import Path
+
+from _utils.config_operations import read_config, initialize_logging
+from _utils.file_operations import get_cache_dir
+from _utils.html_operations import close_persistent_compiler
+import build
+
+DAEMON_FILE_NAME = "daemon.json"
+DAEMON_COMMANDS = ("start", "build", "status", "stop")
+
+
+def get_daemon_file(config, root):
+    """Return the path of the file advertising a running daemon's port and token."""
+    return Path(root) / get_cache_dir(config) / DAEMON_FILE_NAME
+
+
+class BuildDaemon:
+    """
+    Long-running build process that accepts build requests on a localhost port.
+
+    The project configuration is reloaded only when ``config.json`` changes,
+    and the imported modules, the Jinja2 environment, the persistent Sass
+    compiler, the library reference scans and the build manifest, copy state
+    and parsed-slide caches stay in memory between builds.
+
+    Requests and responses are single-line JSON objects. Every request carries
+    the ``token`` written to ``source/cached/.revealpack/daemon.json`` along
+    with the port, so only processes able to read the project can use it.
+    """
+
+    def __init__(self, root, port=0, log_level=None):
+        self.root = os.path.abspath(root)
+        self.port = port
+        self.log_level = log_level
+        self.token = secrets.token_hex(16)
+        self.config = None
+        self.config_key = None
+        self.build_lock = threading.Lock()
+        self.builds = 0
+        self.last_build = None
+        self.started = time.time()
+        self.server = None
+
+    def load_config(self):
+        """Return the project configuration, rereading it only after config.json changed."""
+        config_path = os.path.join(self.root, "config.json")
+        try:
+            stat_result = os.stat(config_path)
+            key = (stat_result.st_size, stat_result.st_mtime_ns)
+        except OSError:
+            key = None
+        if self.config is None or key != self.config_key:
+            if self.config is not None:
+                logging.info("config.json changed, reloading configuration.")
+            self.config = read_config(self.root)
+            self.config_key = key
+        return self.config
+
+    def build(self, request):
+        """Run a build in this process and return the response for ``request``."""
+        build_args = ["--root", self.root]
+        if request.get("clean"):
+            build_args.append("--clean")
+        decks = request.get("decks")
+        if decks:
+            build_args.extend(["--decks", decks if isinstance(decks, str) else ",".join(decks)])
+        if request.get("jobs") is not None:
+            build_args.extend(["--jobs", str(request["jobs"])])
+        log_level = request.get("log_level") or self.log_level
+        if log_level:
+            build_args.extend(["--log-level", log_level])
+
+        with self.build_lock:
+            start = time.perf_counter()
+            try:
+                build.main(build_args, persistent_sass=True, project_config=self.load_config())
+                response = {"status": "ok"}
+            except SystemExit as e:
+                response = {"status": "ok"} if not e.code else {"status": "error", "message": f"Build exited with code {e.code}"}
+            except Exception as e:
+                logging.error(f"Build failed: {e}")
+                logging.debug(traceback.format_exc())
+                response = {"status": "error", "message": str(e)}
+            response["duration"] = round(time.perf_counter() - start, 3)
+            self.builds += 1
+            self.last_build = response
+        logging.info(f"Build finished with status '{response['status']}' in {response['duration']}s.")
+        return response
+
+    def handle(self, request):
+        """Dispatch a decoded request and return the response object."""
+        if not secrets.compare_digest(str(request.get("token", "")), self.token):
+            return {"status": "error", "message": "Invalid token"}
+        command = request.get("command")
+        if command == "build":
+            return self.build(request)
+        if command == "status":
+            return {
+                "status": "ok",
+                "root": self.root,
+                "pid": os.getpid(),
+                "uptime": round(time.time() - self.started, 3),
+                "building": self.build_lock.locked(),
+                "builds": self.builds,
+                "last_build": self.last_build,
+            }
+        if command == "stop":
+            # shutdown() waits for serve_forever(), so it must not run on a request thread
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return {"status": "ok"}
+        return {"status": "error", "message": f"Unknown command '{command}'"}
+
+    def serve_forever(self):
+        """Listen for requests until stopped, advertising the port in the daemon file."""
+        config = self.load_config()
+        daemon_file = get_daemon_file(config, self.root)
+        self.server = DaemonServer(("127.0.0.1", self.port), DaemonRequestHandler, self)
+        host, port = self.server.server_address
+        os.makedirs(daemon_file.parent, exist_ok=True)
+        # Only the current user may read the token
+        fd = os.open(daemon_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"host": host, "port": port, "pid": os.getpid(), "token": self.token}, f)
+        logging.info(f"Build daemon listening on {host}:{port}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if daemon_file.exists():
+                daemon_file.unlink()
+            close_persistent_compiler()
+            logging.info("Build daemon stopped.")
+
+
+class DaemonServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handler, build_daemon):
+        self.build_daemon = build_daemon
+        super().__init__(address, handler)
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                response = {"status": "error", "message": f"Invalid request: {e}"}
+            else:
+                response = self.server.build_daemon.handle(request)
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+def send_request(config, root, request, timeout=None):
+    """
+    Send a request to the daemon running for the project and return its response.
+
+    Returns None if no daemon is running.
+    """
+    daemon_file = get_daemon_file(config, root)
+    try:
+        with open(daemon_file, "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    try:
+        with socket.create_connection((info["host"], info["port"]), timeout=timeout) as sock:
+            sock.sendall(json.dumps({**request, "token": info["token"]}).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+    except OSError:
+        return None
+    return json.loads(line) if line else None
+
+
+def main(argv=None):
+    """Run the build daemon or send it a request, from command-line arguments."""
+    parser = argparse.ArgumentParser(description='Run a long-lived build daemon or send it requests.')
+    parser.add_argument('command', nargs='?', choices=DAEMON_COMMANDS, default='start', help='Start the daemon, or request a build, its status or a stop')
+    parser.add_argument('-r', '--root', type=str, default=os.getcwd(), help='Root directory of the project')
+    parser.add_argument('-p', '--port', type=int, default=0, help='Port to listen on when starting (default: any free port)')
+    parser.add_argument('-c', '--clean', action='store_true', help='Perform a clean build')
+    parser.add_argument('-d', '--decks', type=str, default=None, help='Comma-separated list of decks or a path to a file with deck names')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Number of worker processes for deck rendering (0 uses all cores)')
+    parser.add_argument('--log-level', type=str, default=None, help='Set the logging level')
+    args = parser.parse_args(argv)
+
+    config = read_config(args.root)
+    initialize_logging(config, args.log_level)
+
+    if args.command == "start":
+        if send_request(config, args.root, {"command": "status"}, timeout=2) is not None:
+            logging.error("A build daemon is already running for this project.")
+            sys.exit(1)
+        # Resolve the root before changing into it, relative roots would resolve twice
+        root = os.path.abspath(args.root)
+        # Paths in config.json are relative to the project root
+        os.chdir(root)
+        build.keep_resident_state()
+        # Clean up the daemon file when terminated
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        daemon = BuildDaemon(root, port=args.port, log_level=args.log_level)
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    request = {"command": args.command}
+    if args.command == "build":
+        decks = args.decks
+        # The daemon runs in the project root, resolve deck list files from here
+        if decks and os.path.isfile(decks):
+            decks = os.path.abspath(decks)
+        request.update({"clean": args.clean, "decks": decks, "jobs": args.jobs, "log_level": args.log_level})
+    response = send_request(config, args.root, request)
+    if response is None:
+        logging.error("No build daemon is running for this project. Start one with 'revealpack daemon'.")
+        sys.exit(1)
+    print(json.dumps(response, indent=2))
+    if response.get("status") != "ok":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
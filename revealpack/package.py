@@ -1,12 +1,11 @@
 import os
-import shutil
 import argparse
-import subprocess
 import sys
 import logging
 import json
 from _utils.config_operations import read_config, initialize_logging
 from _utils.string_operations import sanitize_name
+from _utils.file_operations import CopyState, get_cache_dir, set_copy_mode, sync_tree
 
 def create_package_json(config, dest_dir):
     package_info = config['info']
@@ -328,31 +327,35 @@ def handle_target_dir(target_dir, config):
 
 def run_build_step(root, no_build, clean, decks):
     if not no_build:
-        build_script = os.path.join(os.path.dirname(__file__), 'build.py')
-        python_executable = sys.executable
-        build_cmd = [python_executable, build_script, '--root', root]
+        # Build in this process rather than starting another interpreter
+        import build
+
+        build_args = ['--root', root]
         
         if clean:
-            build_cmd.append('--clean')
+            build_args.append('--clean')
         
         if decks:
-            build_cmd.extend(['--decks', decks])
+            build_args.extend(['--decks', decks])
 
         try:
-            subprocess.run(build_cmd, check=True)
+            build.main(build_args)
             logging.info("Build completed successfully.")
-        except subprocess.CalledProcessError as e:
-            logging.error(f"An error occurred during build: {e}")
-            sys.exit(1)
-
-def copy_build_output(build_src_dir, target_src_dir):
-    # Clean Target Source
-    if os.path.exists(target_src_dir):
-        shutil.rmtree(target_src_dir)
-        logging.info(f"Cleaned existing directory: {target_src_dir}")
-    # Copy from build
-    shutil.copytree(build_src_dir, target_src_dir)
-    logging.info(f"Copied {build_src_dir} to {target_src_dir}")
+        except SystemExit as e:
+            if e.code:
+                logging.error(f"An error occurred during build: exit code {e.code}")
+                sys.exit(1)
+
+def copy_build_output(build_src_dir, target_src_dir, copy_state=None):
+    """
+    Sync the build into the package source directory, copying only new or
+    changed files (using the configured copy mode) and removing deleted ones.
+    """
+    copied, removed, unchanged = sync_tree(build_src_dir, target_src_dir, copy_state)
+    logging.info(
+        f"Synced {build_src_dir} to {target_src_dir}: "
+        f"{copied} files copied, {removed} removed, {unchanged} unchanged"
+    )
 
 def update_or_create_package(config, target_dir):
     package_json_path = os.path.join(target_dir, 'package.json')
@@ -384,14 +387,14 @@ def update_or_create_package(config, target_dir):
         create_github_workflow(config, target_dir)
         create_main_js(target_dir)
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='Package Reveal.js presentations into a distributable format.')
     parser.add_argument('-r', '--root', type=str, default=os.getcwd(), help='Root directory for packaging')
     parser.add_argument('-t', '--target-dir', type=str, default=None, help='Directory to create the package')
     parser.add_argument('-n', '--no-build', action='store_true', help='Skip the build step')
     parser.add_argument('-c', '--clean', action='store_true', help='Perform a clean build before packaging')
     parser.add_argument('-d', '--decks', type=str, help='Specify decks to build (comma-separated values or a file path)')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # Load config and initialize logging
     config = read_config(args.root)
@@ -406,7 +409,16 @@ def main():
     target_dir = handle_target_dir(args.target_dir, config)
     target_src_dir = os.path.join(target_dir, 'src')
     build_src_dir = config["directories"]["build"]
-    copy_build_output(build_src_dir, target_src_dir)
+    try:
+        set_copy_mode(config.get("build_settings", {}).get("copy_mode", "copy"))
+    except ValueError as e:
+        logging.error(str(e))
+        sys.exit(1)
+    # Stat data of the packaged files, kept apart from the build's copy state
+    # because builds prune the entries they did not copy
+    copy_state = CopyState(get_cache_dir(config) / "package_state.json")
+    copy_build_output(build_src_dir, target_src_dir, copy_state)
+    copy_state.save()
 
     update_or_create_package(config, target_dir)
 
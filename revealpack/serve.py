@@ -1,119 +1,270 @@
 import os
-import sys
-import subprocess
 import time
-import shutil
-import threading
 import logging
-import glob
 import argparse
+import threading
+from queue import Queue, Empty
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
 from _utils.config_operations import read_config, initialize_logging
+from _utils.html_operations import close_persistent_compiler, diff_slide_sections
+from _utils.server_operations import StaticServer, LiveReload
+from _utils.watch_operations import BuildRouter, BuildQueue, BuildCancelled, ChangeSet, WATCHED_EVENT_TYPES
+import build
+
+# How often the idle serve loop wakes up so Ctrl+C is handled on every platform
+IDLE_TIMEOUT = 1.0
 
 
 class Watcher:
-    def __init__(self, watch_directory, build_directory, clean=False, decks=None):
-        self.watch_directory = watch_directory
-        self.build_directory = build_directory
-        self.clean = clean
-        self.decks = decks
-        self.event_handler = WatchHandler(clean=self.clean, decks=self.decks)
+    """Watch directories in the background and put file system events on a queue."""
+
+    def __init__(self, events):
+        self.event_handler = WatchHandler(events)
         self.observer = Observer()
+        self.directories = []
 
-    def run(self):
-        self.observer.schedule(self.event_handler, self.watch_directory, recursive=True)
+    def watch(self, directories):
+        """Watch exactly the given (directory, recursive) pairs."""
+        if directories == self.directories:
+            return
+        self.observer.unschedule_all()
+        for directory, recursive in directories:
+            logging.debug(f"Watching {directory}{' recursively' if recursive else ''}")
+            self.observer.schedule(self.event_handler, directory, recursive=recursive)
+        self.directories = directories
+
+    def start(self):
         self.observer.start()
-        try:
-            while True:
-                pass
-        except:
-            self.observer.stop()
-            logging.info("Observer stopped")
+
+    def stop(self):
+        self.observer.stop()
+        self.observer.join()
+        logging.info("Observer stopped")
 
 
 class WatchHandler(FileSystemEventHandler):
-    debounce_delay = 3  # prevent multiple rapid triggers
-    cooldown_time = 35  # refractory period after first build
-    last_build_time = 0
-    timer = None
-    pending_trigger = False
+    def __init__(self, events):
+        self.events = events
+
+    def on_any_event(self, event):
+        # Opening and closing files, which builds do too, changes nothing
+        if event.event_type in WATCHED_EVENT_TYPES:
+            self.events.put(event)
+
+
+class Rebuilder:
+    """
+    Consume file system events from a queue and rebuild the presentations.
+
+    ``collect()`` runs in a background thread: it debounces events so a
+    burst of saves becomes a single change set, and a ``BuildRouter`` maps
+    the changed paths to the build stages covering them, so a slide edit
+    only re-renders its deck and a theme edit only compiles the theme, while
+    a change to ``config.json`` runs a full build and updates the watched
+    directories. Change sets are merged on a ``BuildQueue`` that ``run()``
+    takes builds from. Changes made during a build are built right after
+    it, and a running build whose work is entirely redone by newer changes
+    is cancelled at its next checkpoint, so the build output always catches
+    up with the last edit. The first build is a full build. Builds run in the
+    serve process, so templates, caches and the persistent Sass compiler
+    stay warm.
+
+    With a ``LiveReload``, open pages are told about each rebuild: slides
+    whose HTML changed are sent to be swapped in place, and the page reloads
+    only when the deck structure or anything outside the slides changed.
+    Other rebuilds reload every open page.
+    """
 
-    def __init__(self, clean=False, decks=None):
+    debounce_delay = 0.2  # collect the events of a burst of saves
+
+    def __init__(self, events, root, config, watcher=None, clean=False, decks=None, build_directory=None, live_reload=None):
+        self.events = events
+        self.root = root
+        self.router = BuildRouter(config)
+        self.watcher = watcher
         self.clean = clean
         self.decks = decks
+        self.build_directory = build_directory
+        self.live_reload = live_reload
+        self.build_queue = BuildQueue()
+        self.built = False
+        # Pages as last sent to the browsers, kept while builds fail or are cancelled
+        self.unpublished = {}
 
-    def trigger(self):
-        current_time = time.time()
-        if current_time - WatchHandler.last_build_time < WatchHandler.cooldown_time:
-            logging.info("Build request ignored due to cooldown.")
-            return
+    def get_changed_deck(self, path):
+        """Return the deck folder containing path, or None if it is outside every deck."""
+        relative = os.path.relpath(path, self.router.presentation_root)
+        if relative == os.curdir or relative.startswith(os.pardir):
+            return None
+        return relative.split(os.sep, 1)[0]
 
+    def full_build(self):
         logging.info("Triggering build...")
-        build_command = ["revealpack", "build"]
-        if self.clean:
-            build_command.append("--clean")
+        build_args = ["--root", self.root]
+        # Only the first build is a clean build
+        if self.clean and not self.built:
+            build_args.append("--clean")
         if self.decks:
-            build_command.extend(["--decks", self.decks])
+            build_args.extend(["--decks", self.decks])
+        build.main(build_args, persistent_sass=True)
+        self.built = True
+        # The configuration may have changed the locations to watch
+        self.router.update(build.config)
+        if self.watcher is not None:
+            self.watcher.watch(self.router.watch_directories())
 
-        try:
-            subprocess.run(build_command)
-            WatchHandler.last_build_time = time.time()
-            logging.info("Successfully ran build.py")
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Failed to run build.py: {e}")
+    def read_pages(self, decks):
+        """Return the current HTML of the pages a rebuild of decks can change."""
+        pages = {}
+        for page in [f"{deck}.html" for deck in decks] + ["index.html"]:
+            try:
+                with open(os.path.join(self.build_directory, page), "r", encoding="utf-8") as f:
+                    pages[page] = f.read()
+            except OSError:
+                pages[page] = None
+        return pages
 
-    def process(self, event):
-        logging.info(f"Event type: {event.event_type} at {event.src_path}")
+    def publish_changes(self, previous, paths):
+        """Send the slides that changed since ``previous`` to the open pages."""
+        current = self.read_pages(page[:-len(".html")] for page in previous if page != "index.html")
+        for page, old_html in previous.items():
+            new_html = current[page]
+            if new_html == old_html:
+                continue
+            diff = None
+            if page != "index.html" and old_html is not None and new_html is not None:
+                diff = diff_slide_sections(old_html, new_html)
+            if diff is None:
+                self.live_reload.publish("reload", {"page": page})
+                continue
+            count, changes = diff
+            deck = page[:-len(".html")]
+            self.live_reload.publish("slides", {
+                "page": page,
+                "count": count,
+                "slides": [{"index": index, "html": html} for index, html in changes],
+                "sources": sorted({
+                    os.path.relpath(path, self.router.presentation_root).replace(os.sep, "/")
+                    for path in paths if self.get_changed_deck(path) == deck and os.path.isfile(path)
+                }),
+            })
 
-        if WatchHandler.pending_trigger:
-            if WatchHandler.timer:
-                WatchHandler.timer.cancel()
-        else:
-            WatchHandler.pending_trigger = True
+    def rebuild(self, changes):
+        """Run the smallest build covering a change set."""
+        start = time.perf_counter()
+        cancelled = False
+        build.set_cancel_check(self.build_queue.check_cancelled)
+        try:
+            if not self.built or changes.full:
+                self.full_build()
+                if self.live_reload is not None:
+                    self.live_reload.publish("reload", {})
+            elif self.live_reload is not None and changes.decks_only:
+                # Keep the versions of pages that interrupted builds changed without publishing
+                previous = {**self.read_pages(changes.decks), **self.unpublished}
+                self.unpublished = previous
+                build.rebuild_stages(changes)
+                self.publish_changes(previous, changes.paths)
+            else:
+                build.rebuild_stages(changes)
+                if self.live_reload is not None:
+                    self.live_reload.publish("reload", {})
+            self.unpublished = {}
+            logging.info(f"Rebuilt in {time.perf_counter() - start:.2f}s")
+        except BuildCancelled:
+            cancelled = True
+            logging.info(f"Build cancelled after {time.perf_counter() - start:.2f}s")
+        except SystemExit as e:
+            if e.code:
+                logging.error(f"Failed to run build.py: exit code {e.code}")
+        except Exception as e:
+            logging.error(f"Failed to run build.py: {e}")
+        finally:
+            build.set_cancel_check(None)
+            self.build_queue.done(cancelled)
 
-        WatchHandler.timer = threading.Timer(
-            WatchHandler.debounce_delay, self.trigger
-        )
-        WatchHandler.timer.start()
+    def collect(self):
+        """Route bursts of file system events to change sets on the build queue until stopped."""
+        while True:
+            event = self.events.get()
+            changes = ChangeSet()
+            # Collect events until none arrived for the debounce delay
+            while event is not None:
+                logging.debug(f"Event type: {event.event_type} at {event.src_path}")
+                self.router.add_event(changes, event)
+                try:
+                    event = self.events.get(timeout=self.debounce_delay)
+                except Empty:
+                    break
+            if changes:
+                self.build_queue.put(changes)
+            if event is None:
+                return
 
-    def on_modified(self, event):
-        self.process(event)
+    def run(self):
+        """Block waiting for queued changes and build them."""
+        while True:
+            changes = self.build_queue.get(timeout=IDLE_TIMEOUT)
+            if changes is not None:
+                self.rebuild(changes)
 
 
-if __name__ == "__main__":
+def main(argv=None):
+    """Serve the build directory and rebuild on changes, from command-line arguments."""
     parser = argparse.ArgumentParser(description='Serve the presentation with watcher.')
     parser.add_argument('--root', type=str, default=os.getcwd(), help='Target directory for setup')
     parser.add_argument('-n', '--no-build', action='store_true', help='Skip build and only run the server')
     parser.add_argument('-c', '--clean', action='store_true', help='Perform a clean build before serving')
     parser.add_argument('-d', '--decks', type=str, help='Specify decks to build (comma-separated values or a file path)')
-    args = parser.parse_args()
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to serve on (default: 127.0.0.1, use 0.0.0.0 to share on the network)')
+    parser.add_argument('-p', '--port', type=int, default=8000, help='Port to serve on (default: 8000, or a free port if in use)')
+    parser.add_argument('--no-browser', action='store_true', help='Do not open the presentations in a browser')
+    parser.add_argument('--no-live-reload', action='store_true', help='Do not update open presentations after a rebuild')
+    args = parser.parse_args(argv)
 
     config = read_config(args.root)
     initialize_logging(config)
 
-    watch_directory = os.path.join(
-        config["directories"]["source"]["root"],
-        config["directories"]["source"]["presentation_root"],
-    )
     build_directory = config["directories"]["build"]
 
-    if not args.no_build:
-        logging.info(f"Starting build watch on {watch_directory}")
-        watcher = Watcher(watch_directory, build_directory, clean=args.clean, decks=args.decks)
-        watcher_thread = threading.Thread(target=watcher.run)
-        watcher_thread.daemon = True
-        watcher_thread.start()
+    events = Queue()
+    live_reload = None if args.no_build or args.no_live_reload else LiveReload()
+    watcher = None if args.no_build else Watcher(events)
+    rebuilder = Rebuilder(
+        events, args.root, config, watcher=watcher, clean=args.clean, decks=args.decks,
+        build_directory=build_directory, live_reload=live_reload,
+    )
+    collector = None
+    if watcher is not None:
+        directories = rebuilder.router.watch_directories()
+        logging.info(f"Starting build watch on {', '.join(directory for directory, _ in directories)}")
+        watcher.watch(directories)
+        watcher.start()
+        collector = threading.Thread(target=rebuilder.collect, name="change-collector", daemon=True)
+        collector.start()
+        build.keep_resident_state()
+        rebuilder.rebuild(ChangeSet())
 
-    http_service = subprocess.Popen(f"http-server {build_directory} -o", shell=True)
+    server = StaticServer(build_directory, host=args.host, port=args.port, live_reload=live_reload)
+    server.start()
+    if not args.no_browser:
+        import webbrowser
+        webbrowser.open(server.url)
 
     try:
-        while True:
-            pass
+        rebuilder.run()
     except KeyboardInterrupt:
         logging.info("Shutting down server.")
-        if not args.no_build:
-            watcher.observer.stop()
-            watcher.observer.join()
-        http_service.kill()
+    finally:
+        if watcher is not None:
+            watcher.stop()
+            events.put(None)
+            collector.join()
+        close_persistent_compiler()
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -671,7 +671,19 @@ def create_toc_template():
     logging.info(f"TOC template created at {toc_template_path}")
 
 
-def main():
+def main(argv=None):
+    """Run the setup from command-line arguments."""
+    global args, config
+    parser = argparse.ArgumentParser(description='Setup Reveal.js presentation environment.')
+    parser.add_argument('--root', type=str, default=os.getcwd(), help='Target directory for setup')
+    parser.add_argument('--force-plugin-download', '-f', action='store_true', help='Force plugin download')
+    args = parser.parse_args(argv)
+    
+    if args.force_plugin_download:
+        write_config(args.root, "force_plugin_download", True, force=True)
+
+    config = read_config(args.root)
+
     initialize_logging(config)
     create_directories()
     download_and_install_packages()
@@ -684,13 +696,4 @@ def main():
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='Setup Reveal.js presentation environment.')
-    parser.add_argument('--root', type=str, default=os.getcwd(), help='Target directory for setup')
-    parser.add_argument('--force-plugin-download', '-f', action='store_true', help='Force plugin download')
-    args = parser.parse_args() #global
-    
-    if args.force_plugin_download:
-        write_config(args.root, "force_plugin_download", True, force=True)
-
-    config = read_config(args.root)
     main()
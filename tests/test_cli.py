@@ -0,0 +1,37 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from revealpack import cli
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(cli.__file__))
+
+
+def fake_script(monkeypatch, main):
+    monkeypatch.setattr(cli.importlib, "import_module", lambda name: SimpleNamespace(main=main))
+
+
+def test_run_script_restores_sys_path(monkeypatch):
+    seen = []
+    fake_script(monkeypatch, lambda argv: seen.append(sys.path[0]))
+    before = list(sys.path)
+
+    cli.run_script("build", [])
+
+    assert seen == [SCRIPT_DIR]
+    assert sys.path == before
+
+
+def test_run_script_restores_sys_path_on_error(monkeypatch):
+    def main(argv):
+        sys.exit(2)
+
+    fake_script(monkeypatch, main)
+    before = list(sys.path)
+
+    with pytest.raises(SystemExit):
+        cli.run_script("build", [])
+
+    assert sys.path == before
@@ -0,0 +1,195 @@
+import os
+import re
+import time
+
+from revealpack._utils.file_operations import (
+    CopyState,
+    ExclusionMatcher,
+    _copy_with_state,
+    copy_file,
+    scan_tree,
+    sync_tree,
+    unshare_file,
+)
+
+# An mtime well outside the racy window, so recorded stat data is trusted
+OLD_MTIME_NS = time.time_ns() - 3600 * 1_000_000_000
+
+
+def write(path, content, mtime_ns=OLD_MTIME_NS):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def replace_keeping_stat(path, content):
+    """Rewrite path in place with same-sized content and its old timestamps."""
+    stat = os.stat(path)
+    path.write_bytes(content)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_unchanged_file_is_skipped_from_its_stat_data(tmp_path):
+    src = write(tmp_path / "src" / "a.txt", b"original")
+    dest = tmp_path / "dest" / "a.txt"
+    dest.parent.mkdir()
+    state_path = tmp_path / "cache" / "copy_state.json"
+
+    state = CopyState(state_path)
+    assert _copy_with_state(state, str(src), str(dest))
+    state.save()
+
+    # Same size, mtime and inode: a reloaded state trusts the recorded stat
+    # data and never reads the file, so this edit goes unnoticed
+    replace_keeping_stat(dest, b"modified")
+    state = CopyState(state_path)
+    assert not _copy_with_state(state, str(src), str(dest))
+    assert dest.read_bytes() == b"modified"
+
+
+def test_recently_modified_source_is_hashed_again(tmp_path):
+    src = write(tmp_path / "src" / "a.txt", b"original", mtime_ns=time.time_ns())
+    dest = tmp_path / "dest" / "a.txt"
+    dest.parent.mkdir()
+
+    state = CopyState()
+    assert _copy_with_state(state, str(src), str(dest))
+    assert state.entries[str(dest)]["src_stat"] is None
+
+    replace_keeping_stat(dest, b"modified")
+    assert _copy_with_state(state, str(src), str(dest))
+    assert dest.read_bytes() == b"original"
+
+
+def test_changed_source_is_copied(tmp_path):
+    src = write(tmp_path / "src" / "a.txt", b"original")
+    dest = tmp_path / "dest" / "a.txt"
+    dest.parent.mkdir()
+    state = CopyState()
+    _copy_with_state(state, str(src), str(dest))
+
+    write(src, b"changed!", mtime_ns=OLD_MTIME_NS + 1_000_000_000)
+    assert _copy_with_state(state, str(src), str(dest))
+    assert dest.read_bytes() == b"changed!"
+    # Without the state, equal content is still found by hashing
+    assert not _copy_with_state(CopyState(), str(src), str(dest))
+
+
+def test_copy_file_replaces_hard_linked_destination(tmp_path):
+    original = write(tmp_path / "original.txt", b"shared")
+    dest = tmp_path / "dest.txt"
+    os.link(original, dest)
+    src = write(tmp_path / "src.txt", b"new content")
+
+    copy_file(str(src), str(dest), mode="copy")
+
+    assert dest.read_bytes() == b"new content"
+    assert original.read_bytes() == b"shared"
+    assert os.stat(original).st_nlink == 1
+    assert not [p for p in os.listdir(tmp_path) if p.endswith(".tmp")]
+
+
+def test_unshare_file_only_removes_linked_files(tmp_path):
+    original = write(tmp_path / "original.txt", b"shared")
+    linked = tmp_path / "linked.txt"
+    os.link(original, linked)
+    single = write(tmp_path / "single.txt", b"alone")
+
+    unshare_file(str(linked))
+    unshare_file(str(single))
+    unshare_file(str(tmp_path / "missing.txt"))
+
+    assert not linked.exists()
+    assert original.read_bytes() == b"shared"
+    assert single.read_bytes() == b"alone"
+
+
+def should_exclude(path, patterns):
+    """The per-pattern check ExclusionMatcher replaced."""
+    return any(
+        re.search(pattern, str(path)) if pattern.endswith('$') else re.search(pattern, path.name)
+        for pattern in patterns
+    )
+
+
+ASSET_EXCLUSIONS = [
+    r"styles",
+    r"\.git",
+    r"\.DS_Store",
+    r"Thumbs\.db",
+    r"\.tmp$",
+    r"\.log$",
+    r"^draft_",
+    r"(?i)\.BAK$",
+    r"(a)\1",
+]
+
+
+def test_exclusion_matcher_agrees_with_per_pattern_search(tmp_path):
+    names = [
+        "styles", "mystyles.css", ".gitignore", ".DS_Store", "Thumbs.db", "thumbs.db",
+        "notes.tmp", "tmp.notes", "build.log", "logo.png", "draft_slide.png", "final_draft_.png",
+        "old.bak", "old.BAK", "aa.png", "ab.png",
+    ]
+    matcher = ExclusionMatcher(ASSET_EXCLUSIONS)
+    for name in names:
+        path = tmp_path / "assets" / name
+        assert matcher.matches(name, str(path)) == should_exclude(path, ASSET_EXCLUSIONS), name
+
+
+def test_end_anchored_patterns_match_the_full_path(tmp_path):
+    matcher = ExclusionMatcher([r"assets/private/.*$"])
+    assert matcher.matches("a.png", str(tmp_path / "assets" / "private" / "a.png"))
+    assert not matcher.matches("a.png", str(tmp_path / "assets" / "public" / "a.png"))
+
+
+def test_scan_tree_skips_excluded_entries_and_their_contents(tmp_path):
+    root = tmp_path / "assets"
+    for relative in ["logo.png", "img/photo.jpg", "img/debug.log", "styles/main.scss", ".git/config"]:
+        write(root / relative, b"x")
+
+    entries = {
+        relative: is_dir
+        for _, relative, is_dir in scan_tree(root, ExclusionMatcher(ASSET_EXCLUSIONS))
+    }
+
+    assert entries == {
+        "logo.png": False,
+        "img": True,
+        os.path.join("img", "photo.jpg"): False,
+    }
+    assert len(list(scan_tree(root))) == 8
+
+
+def test_sync_tree_mirrors_source_and_removes_stale_entries(tmp_path):
+    src = tmp_path / "src"
+    dest = tmp_path / "dest"
+    write(src / "keep.js", b"keep")
+    write(src / "change.js", b"old")
+    write(src / "nested" / "deep.css", b"deep")
+    state = CopyState(tmp_path / "copy_state.json")
+
+    assert sync_tree(src, dest, state) == (3, 0, 0)
+    state.save()
+
+    write(src / "change.js", b"new", mtime_ns=OLD_MTIME_NS + 1_000_000_000)
+    write(src / "added.js", b"added")
+    (src / "nested" / "deep.css").unlink()
+    (src / "nested").rmdir()
+    write(dest / "stray" / "old.js", b"stray")
+    # A path that changed from a directory into a file
+    write(src / "swap", b"file now")
+    write(dest / "swap" / "inner.txt", b"was a directory")
+
+    state = CopyState(tmp_path / "copy_state.json")
+    copied, removed, unchanged = sync_tree(src, dest, state)
+
+    assert (copied, unchanged) == (3, 1)
+    # The nested, stray and swap directories, each removed as a whole
+    assert removed == 3
+    assert sorted(p.relative_to(dest).as_posix() for p in dest.rglob("*")) == [
+        "added.js", "change.js", "keep.js", "swap",
+    ]
+    assert (dest / "change.js").read_bytes() == b"new"
+    assert (dest / "swap").read_bytes() == b"file now"
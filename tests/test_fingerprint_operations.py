@@ -0,0 +1,50 @@
+import json
+
+from revealpack._utils.fingerprint_operations import ASSET_MANIFEST_NAME, AssetFingerprinter
+
+
+def build_tree(tmp_path):
+    build_dir = tmp_path / "build"
+    (build_dir / "lib").mkdir(parents=True)
+    (build_dir / "lib" / "a.png").write_bytes(b"same")
+    (build_dir / "lib" / "b.png").write_bytes(b"same")
+    (build_dir / "d1.html").write_text('<img src="lib/a.png">', encoding="utf-8")
+    (build_dir / "d2.html").write_text('<img src="lib/b.png">', encoding="utf-8")
+    return build_dir
+
+
+def fingerprint(build_dir, state_path):
+    html_files = [str(build_dir / "d1.html"), str(build_dir / "d2.html")]
+    return AssetFingerprinter(build_dir, state_path).run(html_files)
+
+
+def test_identical_assets_keep_their_originals_across_builds(tmp_path):
+    build_dir = build_tree(tmp_path)
+    state_path = tmp_path / "cache" / "asset_hashes.json"
+
+    first = fingerprint(build_dir, state_path)
+    assert first["lib/a.png"] == first["lib/b.png"]
+
+    # Only the asset changes, the pages are not rebuilt and still reference the shared hashed name
+    (build_dir / "lib" / "b.png").write_bytes(b"changed")
+    second = fingerprint(build_dir, state_path)
+
+    assert set(second) == {"lib/a.png", "lib/b.png"}
+    assert second["lib/a.png"] == first["lib/a.png"]
+    assert second["lib/b.png"] != first["lib/b.png"]
+    assert (build_dir / "d1.html").read_text(encoding="utf-8") == f'<img src="{second["lib/a.png"]}">'
+    assert (build_dir / "d2.html").read_text(encoding="utf-8") == f'<img src="{second["lib/b.png"]}">'
+    assert (build_dir / second["lib/b.png"]).read_bytes() == b"changed"
+    manifest = json.loads((build_dir / ASSET_MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert manifest["assets"] == second
+
+
+def test_rebuilt_page_references_are_fingerprinted_again(tmp_path):
+    build_dir = build_tree(tmp_path)
+    state_path = tmp_path / "cache" / "asset_hashes.json"
+    fingerprint(build_dir, state_path)
+
+    (build_dir / "d1.html").write_text('<img src="./lib/a.png?v=1">', encoding="utf-8")
+    assets = fingerprint(build_dir, state_path)
+
+    assert (build_dir / "d1.html").read_text(encoding="utf-8") == f'<img src="./{assets["lib/a.png"]}?v=1">'
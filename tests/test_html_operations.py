@@ -0,0 +1,62 @@
+from bs4 import BeautifulSoup
+
+from revealpack._utils.html_operations import (
+    fast_beautify_html,
+    prettify_html,
+    split_slide_sections,
+    write_beautified_html,
+)
+
+SAMPLE = """<!DOCTYPE html>
+<html><body>
+<section><p>Fish &amp; chips &copy; 2024</p><p>1 &lt; 2</p></section>
+<svg viewBox="0 0 10 10"><![CDATA[x < y]]><circle cx="5" cy="5" r="4"/><text x="1">a &amp; b</text></svg>
+<pre><code>if (a &lt; b) {
+    return;
+}</code></pre>
+</body></html>
+"""
+
+
+def structure(html):
+    """Return the element names and the normalized text of an HTML document."""
+    soup = BeautifulSoup(html, "html.parser")
+    return [tag.name for tag in soup.find_all()], " ".join(soup.get_text(" ").split())
+
+
+def test_fast_formatter_matches_prettify():
+    assert structure(fast_beautify_html(SAMPLE)) == structure(prettify_html(SAMPLE))
+
+
+def test_fast_formatter_keeps_escaped_markup_as_text():
+    output = fast_beautify_html("<p>a &amp; b &lt;div&gt;</p>")
+    assert "a &amp; b &lt;div&gt;" in output
+    assert structure(output) == (["p"], "a & b <div>")
+
+
+def test_fast_formatter_closes_cdata():
+    output = fast_beautify_html('<svg><![CDATA[x < y]]></svg>')
+    assert "<![CDATA[x < y]]>" in output
+
+
+def test_split_slide_sections_across_lines():
+    html = '<div class="slides">\r\n<section>\n<p>one</p>\n</section>\r\n  <section id="b">two</section>\n</div>\n'
+    skeleton, sections = split_slide_sections(html)
+    assert sections == ['<section>\n<p>one</p>\n</section>', '<section id="b">two</section>']
+    assert skeleton == '<div class="slides">\r\n\r\n  \n</div>\n'
+
+
+def test_streamed_chunks_match_whole_string(tmp_path):
+    from jinja2 import Environment
+
+    template = Environment().from_string(
+        "<section>\n<p>({{ x }})</p>\n<p>Price {{ p }}USD</p>\n<p>{{ x }} &amp; {{ x }}</p>\n</section>\n"
+    )
+    values = {"x": "a", "p": 5}
+    output_path = tmp_path / "deck.html"
+    write_beautified_html(template.generate(**values), str(output_path), formatter="fast")
+
+    streamed = output_path.read_text(encoding="utf-8")
+    assert streamed == fast_beautify_html(template.render(**values))
+    assert "(a)" in streamed
+    assert "Price 5USD" in streamed
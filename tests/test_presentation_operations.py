@@ -0,0 +1,49 @@
+from datetime import date, datetime, timedelta, timezone
+
+from revealpack._utils.presentation_operations import SlideCache, parse_slide
+
+SLIDE = """---
+data-background-color: "#fff"
+published: 2024-03-01
+updated: 2024-03-01 10:30:00+02:00
+tags: [a, b]
+literal: {"__date__": "not a date"}
+---
+<h2>Slide</h2>
+"""
+
+
+def test_slide_cache_round_trips_yaml_dates(tmp_path):
+    slide = tmp_path / "01.html"
+    slide.write_text(SLIDE, encoding="utf-8")
+    cache_path = tmp_path / "cache" / "deck.json"
+
+    cache = SlideCache(cache_path)
+    parsed = parse_slide(str(slide), cache)
+    cache.save()
+
+    cached = parse_slide(str(slide), SlideCache(cache_path))
+    assert cached == parsed
+    attributes = cached["attributes"]
+    assert attributes["published"] == date(2024, 3, 1)
+    assert attributes["updated"] == datetime(2024, 3, 1, 10, 30, tzinfo=timezone(timedelta(hours=2)))
+    assert attributes["literal"] == {"__date__": "not a date"}
+
+
+def test_slide_cache_skips_values_json_cannot_store(tmp_path):
+    slide = tmp_path / "01.html"
+    slide.write_text("---\nitems: !!set {a: null}\n---\n<p>x</p>\n", encoding="utf-8")
+    cache_path = tmp_path / "deck.json"
+
+    cache = SlideCache(cache_path)
+    parse_slide(str(slide), cache)
+    cache.save()
+
+    assert SlideCache(cache_path).entries == {}
+
+
+def test_unreadable_slide_cache_is_a_miss(tmp_path):
+    cache_path = tmp_path / "deck.json"
+    for content in (b"\x80\x04\x95not json", b'{"version": 2, "slides": {"01.html": "bad"}}', b"[1, 2]"):
+        cache_path.write_bytes(content)
+        assert SlideCache(cache_path).entries == {}
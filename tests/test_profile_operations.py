@@ -0,0 +1,14 @@
+from revealpack._utils.profile_operations import Profiler
+
+
+def test_merge_adds_worker_counters():
+    profiler = Profiler()
+    profiler.count("files_copied", 2)
+    worker = Profiler()
+    worker.count("files_copied")
+    worker.count("files_skipped", 3)
+
+    profiler.merge(worker.events, worker.counters)
+
+    assert profiler.counters == {"files_copied": 3, "files_skipped": 3}
+    assert len(profiler.events) == 3
@@ -0,0 +1,16 @@
+from revealpack._utils.reference_operations import normalize_reference, scan_references
+
+
+def test_quoted_paths_may_contain_parentheses():
+    html = '<img src="lib/file (1).png"><div style=\'background: url("lib/bg (2).png")\'></div>'
+    assert scan_references(html, "lib") == {"lib/file (1).png", "lib/bg (2).png"}
+
+
+def test_url_inside_quoted_style_attribute():
+    html = '<div style="background-image: url(lib/a.png)"></div><section data-background=lib/b.png>'
+    assert scan_references(html, "lib") == {"lib/a.png", "lib/b.png"}
+
+
+def test_references_are_posix_paths():
+    assert normalize_reference("..\\lib\\img\\a%20b.png#x", "lib") == "lib/img/a b.png"
+    assert normalize_reference("./lib/sub/inc.html", "lib") == "lib/sub/inc.html"
@@ -0,0 +1,37 @@
+import os
+from types import SimpleNamespace
+
+from revealpack._utils.server_operations import StaticRequestHandler, parse_accept_encoding
+
+
+def request(**headers):
+    return SimpleNamespace(headers={key.replace("_", "-"): value for key, value in headers.items()})
+
+
+def test_parse_accept_encoding_reads_q_values():
+    assert parse_accept_encoding("gzip;q=0.8, br; q=0, identity") == {"gzip": 0.8, "br": 0.0, "identity": 1.0}
+
+
+def test_select_encoding_skips_refused_and_prefers_higher_q(tmp_path):
+    path = str(tmp_path / "deck.html")
+    for name in (path, path + ".br", path + ".gz"):
+        with open(name, "w") as f:
+            f.write("x")
+    stat_result = os.stat(path)
+
+    def select(accept_encoding):
+        return StaticRequestHandler.select_encoding(request(Accept_Encoding=accept_encoding), path, stat_result)[0]
+
+    assert select("gzip, br") == "br"
+    assert select("br;q=0, gzip") == "gzip"
+    assert select("br;q=0.5, gzip;q=0.9") == "gzip"
+    assert select("*;q=0.1") == "br"
+    assert select("br;q=0, gzip;q=0") is None
+    assert select("") is None
+
+
+def test_parse_range_on_empty_file_is_not_satisfiable():
+    parse_range = StaticRequestHandler.parse_range
+    assert parse_range(request(Range="bytes=-10"), '"etag"', 0) is False
+    assert parse_range(request(Range="bytes=0-"), '"etag"', 0) is False
+    assert parse_range(request(Range="bytes=-10"), '"etag"', 100) == (90, 99)
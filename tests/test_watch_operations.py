@@ -0,0 +1,196 @@
+import threading
+
+import pytest
+
+from revealpack._utils.watch_operations import (
+    ASSETS,
+    CUSTOM_CSS,
+    PRESENTATIONS,
+    STYLES,
+    THEME,
+    BuildCancelled,
+    BuildQueue,
+    BuildRouter,
+    ChangeSet,
+)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A project tree with one deck, run from its root like the build."""
+    for relative in [
+        "source/presentations/intro/presentation.yaml",
+        "source/lib/js/app.js",
+        "source/cached/reveal.js/css/theme/source/black.scss",
+        "source/reveal_template.html",
+        "source/toc_template.html",
+        "assets/styles/main.scss",
+        "assets/logo.png",
+        "custom_css/extra.css",
+        "custom_theme/mytheme.scss",
+    ]:
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    config = {
+        "directories": {
+            "build": "build",
+            "source": {"root": "source", "presentation_root": "presentations", "libraries": "lib"},
+        },
+        "reveal_template": "reveal_template.html",
+        "toc_template": "toc_template.html",
+        "theme": "custom_theme/mytheme.scss",
+        "highlight_theme": "monokai",
+    }
+    return tmp_path, BuildRouter(config)
+
+
+def route(router, path, is_directory=False, deleted=False):
+    changes = ChangeSet()
+    router.add_path(changes, path, is_directory, deleted)
+    return changes
+
+
+def test_config_change_requests_full_build(project):
+    root, router = project
+    changes = route(router, root / "config.json")
+    assert changes.full
+    assert changes.describe() == "full build"
+
+
+def test_deck_file_rerenders_only_that_deck(project):
+    root, router = project
+    changes = route(router, root / "source/presentations/intro/slides/01.html")
+    assert changes.decks == {"intro"}
+    assert changes.decks_only
+    assert changes.describe() == "decks intro"
+
+
+def test_deck_folder_changes_regenerate_presentations(project):
+    root, router = project
+    created = route(router, root / "source/presentations/new", is_directory=True)
+    assert created.stages == {PRESENTATIONS}
+    assert not created.removed
+
+    deleted = route(router, root / "source/presentations/intro", is_directory=True, deleted=True)
+    assert deleted.stages == {PRESENTATIONS}
+    assert deleted.removed == {str(root / "build" / "intro.html")}
+
+    # Loose files next to the deck folders are not build inputs
+    assert not route(router, root / "source/presentations/notes.txt")
+
+
+def test_templates_regenerate_presentations(project):
+    root, router = project
+    assert route(router, root / "source/reveal_template.html").stages == {PRESENTATIONS}
+    assert route(router, root / "source/toc_template.html").stages == {PRESENTATIONS}
+
+
+def test_library_files_are_resynced_as_posix_paths(project):
+    root, router = project
+    changed = route(router, root / "source/lib/js/app.js")
+    assert changed.library_files == {"lib/js/app.js"}
+    assert not changed.decks_only
+
+    deleted = route(router, root / "source/lib/js/app.js", deleted=True)
+    assert not deleted.library_files
+    assert deleted.removed == {str(root / "build" / "lib" / "js" / "app.js")}
+
+
+def test_assets_styles_theme_and_custom_css(project):
+    root, router = project
+    assert route(router, root / "assets/styles/main.scss").stages == {STYLES}
+    assert route(router, root / "assets/logo.png").stages == {ASSETS}
+    assert route(router, root / "assets/logo.png", deleted=True).removed == {str(root / "build" / "logo.png")}
+    assert route(router, root / "custom_css/extra.css").stages == {CUSTOM_CSS}
+    assert route(router, root / "custom_theme/mytheme.scss").stages == {THEME}
+    assert route(router, root / "custom_theme/fonts/a.woff2").stages == {THEME}
+    assert route(router, root / "monokai.css").stages == {THEME}
+
+
+def test_generated_and_unrelated_paths_are_ignored(project):
+    root, router = project
+    for path in [
+        root / "source/cached/reveal.js/css/theme/source/black.scss",
+        root / "build/intro.html",
+        root / "README.md",
+    ]:
+        changes = route(router, path)
+        assert not changes, path
+        assert not changes.paths
+
+
+def test_change_set_update_and_covers(project):
+    root, router = project
+    deck = route(router, root / "source/presentations/intro/slides/01.html")
+    styles = route(router, root / "assets/styles/main.scss")
+
+    merged = ChangeSet()
+    merged.update(deck)
+    merged.update(styles)
+    assert merged.decks == {"intro"}
+    assert merged.stages == {STYLES}
+    assert len(merged.paths) == 2
+    assert merged.describe() == "styles; decks intro"
+
+    assert merged.covers(deck) and merged.covers(styles)
+    assert not deck.covers(merged)
+    full = route(router, root / "config.json")
+    assert full.covers(merged)
+    assert not merged.covers(full)
+
+
+def test_queued_changes_are_merged_into_one_build(project):
+    root, router = project
+    queue = BuildQueue()
+    assert queue.get(timeout=0) is None
+
+    queue.put(route(router, root / "source/presentations/intro/slides/01.html"))
+    queue.put(route(router, root / "assets/logo.png"))
+    changes = queue.get(timeout=0)
+    assert changes.decks == {"intro"}
+    assert changes.stages == {ASSETS}
+    assert queue.get(timeout=0) is None
+
+
+def test_get_waits_for_changes_from_another_thread(project):
+    root, router = project
+    queue = BuildQueue()
+    thread = threading.Thread(target=queue.put, args=(route(router, root / "config.json"),))
+    thread.start()
+    changes = queue.get(timeout=5)
+    thread.join()
+    assert changes.full
+
+
+def test_covering_changes_cancel_the_running_build(project):
+    root, router = project
+    queue = BuildQueue()
+    queue.put(route(router, root / "source/presentations/intro/slides/01.html"))
+    running = queue.get(timeout=0)
+
+    # Other work is queued without touching the running build
+    queue.put(route(router, root / "assets/logo.png"))
+    queue.check_cancelled()
+
+    queue.put(route(router, root / "source/presentations/intro/slides/02.html"))
+    with pytest.raises(BuildCancelled):
+        queue.check_cancelled()
+
+    queue.done(cancelled=True)
+    queue.check_cancelled()
+    changes = queue.get(timeout=0)
+    assert changes is running
+    assert changes.decks == {"intro"}
+    assert changes.stages == {ASSETS}
+    assert len(changes.paths) == 3
+
+
+def test_finished_build_is_not_queued_again(project):
+    root, router = project
+    queue = BuildQueue()
+    queue.put(route(router, root / "assets/logo.png"))
+    queue.get(timeout=0)
+    queue.done()
+    assert queue.get(timeout=0) is None